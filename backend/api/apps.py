@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        from django.core import checks
+
+        from .cache import check_shared_cache
+        from .events import check_events_backend
+        checks.register(check_shared_cache, checks.Tags.caches, deploy=True)
+        checks.register(check_events_backend, deploy=True)
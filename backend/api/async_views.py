@@ -0,0 +1,245 @@
+from collections import defaultdict
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.http import HttpResponse
+from django.utils.translation import gettext as _
+from django_filters.rest_framework import DjangoFilterBackend
+from recipes.models import Ingredient, Recipe, Tag
+from rest_framework.exceptions import (APIException, AuthenticationFailed,
+                                       MethodNotAllowed, NotAuthenticated,
+                                       NotFound, ValidationError)
+from rest_framework.request import Request
+
+from .cache import RECIPES_NAMESPACE, TAGS_NAMESPACE, aresponse_cache_key
+from .conditional import (aget_list_validators, aget_recipe_state,
+                          conditional_response, get_detail_validators,
+                          set_validators)
+from .events import get_token_user
+from .fast_serializers import FastRecipeListSerializer
+from .pagination import CustomPagination
+from .renderers import FastJSONRenderer
+from .serializers import (FollowSerializer, IngredientSerializer,
+                          RecipePartSerializer, RecipeReadSerializer,
+                          TagSerializer, get_requested_fields)
+from .snapshots import aget_snapshot, splice_user_flags
+from .views import IngredientViewSet, RecipeViewSet
+
+User = get_user_model()
+
+SAFE_METHODS = ('GET', 'HEAD')
+AUTHOR_COLUMNS = {
+    'email': 'author__email',
+    'id': 'author_id',
+    'username': 'author__username',
+    'first_name': 'author__first_name',
+    'last_name': 'author__last_name',
+    'avatar': 'author__avatar',
+}
+
+
+def json_response(data, status=200):
+    return HttpResponse(
+        FastJSONRenderer().render(data),
+        content_type='application/json',
+        status=status,
+    )
+
+
+async def get_api_request(request):
+    """
+    Запрос DRF с пользователем по токену.
+    Неверный токен отклоняется, как в TokenAuthentication.
+    """
+    api_request = Request(request)
+    user = await get_token_user(request)
+    header = request.headers.get('Authorization', '').split()
+    if user is None and header[:1] == ['Token']:
+        raise AuthenticationFailed(_('Invalid token.'))
+    api_request.user = user if user is not None else AnonymousUser()
+    return api_request
+
+
+def async_api_view(view):
+    """
+    Async-представление только для чтения.
+    Ошибки API отдаются так же, как обработчиком исключений DRF.
+    """
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        try:
+            if request.method not in SAFE_METHODS:
+                raise MethodNotAllowed(request.method)
+            return await view(await get_api_request(request), *args, **kwargs)
+        except APIException as exc:
+            data = exc.detail
+            if not isinstance(data, (list, dict)):
+                data = {'detail': data}
+            response = json_response(data, status=exc.status_code)
+            if isinstance(exc, MethodNotAllowed):
+                response['Allow'] = ', '.join(SAFE_METHODS)
+            if isinstance(exc, (AuthenticationFailed, NotAuthenticated)):
+                response['WWW-Authenticate'] = 'Token'
+            return response
+    return wrapper
+
+
+async def cached_data(request, namespaces, build):
+    """Кэш данных ответа для анонимов, как в AnonymousCacheMixin."""
+    if request.user.is_authenticated:
+        return await build()
+    key = await aresponse_cache_key(request, namespaces)
+    data = await cache.aget(key)
+    if data is None:
+        data = await build()
+        await cache.aset(key, data, settings.API_CACHE_TIMEOUT)
+    return data
+
+
+@async_api_view
+async def tag_list(request):
+    async def build():
+        return [
+            tag async for tag in
+            Tag.objects.values(*TagSerializer.Meta.fields)
+        ]
+    return json_response(await cached_data(request, (TAGS_NAMESPACE,), build))
+
+
+@async_api_view
+async def ingredient_list(request):
+    queryset = IngredientViewSet.CustomSearchFilter().filter_queryset(
+        request, Ingredient.objects.all(), IngredientViewSet
+    )
+    return json_response([
+        ingredient async for ingredient in
+        queryset.values(*IngredientSerializer.Meta.fields)
+    ])
+
+
+def filter_recipes(request):
+    """
+    Фильтрация списка рецептов.
+    Проверка формы фильтра обращается к базе синхронно.
+    """
+    return DjangoFilterBackend().filter_queryset(
+        request, Recipe.objects.all(), RecipeViewSet
+    )
+
+
+@async_api_view
+async def recipe_list(request):
+    queryset = await sync_to_async(filter_recipes)(request)
+    validators = await aget_list_validators(request)
+    not_modified = conditional_response(request, validators)
+    if not_modified is not None:
+        return not_modified
+
+    async def build():
+        serializer = FastRecipeListSerializer(
+            {'request': request},
+            get_requested_fields(request, RecipeReadSerializer.Meta.fields)
+        )
+        paginator = CustomPagination()
+        page = await paginator.apaginate_queryset(
+            serializer.get_queryset(queryset), request
+        )
+        return paginator.get_paginated_response(
+            await serializer.ato_representation(page)
+        ).data
+
+    data = await cached_data(request, (RECIPES_NAMESPACE,), build)
+    return set_validators(request, json_response(data), validators)
+
+
+@async_api_view
+async def recipe_detail(request, pk):
+    state = await aget_recipe_state(request, pk)
+    if state is None:
+        raise NotFound(
+            _('No %s matches the given query.') % Recipe._meta.object_name
+        )
+    validators = get_detail_validators(request, state)
+    not_modified = conditional_response(request, validators)
+    if not_modified is not None:
+        return not_modified
+
+    async def build():
+        return splice_user_flags(
+            await aget_snapshot(state['pk'], state['version']),
+            request, state
+        )
+
+    data = await cached_data(request, (RECIPES_NAMESPACE,), build)
+    return set_validators(request, json_response(data), validators)
+
+
+def get_recipes_limit(request):
+    recipes_limit = request.query_params.get('recipes_limit')
+    if not recipes_limit:
+        return None
+    try:
+        return int(recipes_limit)
+    except ValueError:
+        raise ValidationError(
+            {'recipes_limit': 'Укажите целое число.'}
+        )
+
+
+async def get_author_recipes(author_ids, recipes_limit):
+    """Рецепты авторов страницы подписок одним запросом."""
+    storage = Recipe._meta.get_field('image').storage
+    recipes = defaultdict(list)
+    async for recipe in Recipe.objects.filter(author__in=author_ids).values(
+        'author_id', *RecipePartSerializer.Meta.fields
+    ):
+        author_recipes = recipes[recipe.pop('author_id')]
+        if recipes_limit is not None and len(author_recipes) >= recipes_limit:
+            continue
+        image = recipe['image']
+        recipe['image'] = storage.url(image) if image else None
+        author_recipes.append(recipe)
+    return recipes
+
+
+@async_api_view
+async def subscription_list(request):
+    if not request.user.is_authenticated:
+        raise NotAuthenticated
+    recipes_limit = get_recipes_limit(request)
+    queryset = request.user.follower.filter(
+        author__deleted_at__isnull=True
+    ).annotate(recipes_count=Count(
+        'author__recipes',
+        filter=Q(author__recipes__deleted_at__isnull=True),
+    )).order_by('pk').values(*AUTHOR_COLUMNS.values(), 'recipes_count')
+    paginator = CustomPagination()
+    page = await paginator.apaginate_queryset(queryset, request)
+    recipes = await get_author_recipes(
+        [row['author_id'] for row in page], recipes_limit
+    )
+    storage = User._meta.get_field('avatar').storage
+    data = []
+    for row in page:
+        item = {}
+        for name in FollowSerializer.Meta.fields:
+            if name == 'is_subscribed':
+                item[name] = True
+            elif name == 'avatar':
+                avatar = row[AUTHOR_COLUMNS[name]]
+                item[name] = request.build_absolute_uri(
+                    storage.url(avatar)
+                ) if avatar else None
+            elif name == 'recipes':
+                item[name] = recipes[row['author_id']]
+            elif name == 'recipes_count':
+                item[name] = row[name]
+            else:
+                item[name] = row[AUTHOR_COLUMNS[name]]
+        data.append(item)
+    return json_response(paginator.get_paginated_response(data).data)
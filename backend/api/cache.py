@@ -0,0 +1,123 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.response import Response
+
+RECIPES_NAMESPACE = 'recipes'
+TAGS_NAMESPACE = 'tags'
+LOCMEM_BACKEND = 'django.core.cache.backends.locmem.LocMemCache'
+
+
+def check_shared_cache(app_configs, **kwargs):
+    """
+    Поколения пространств имён увеличиваются и в веб-процессах,
+    и в воркере очереди, а закрепления за основной базой ставит один
+    веб-процесс и читают все, поэтому кэш должен быть общим для них.
+    """
+    backend = settings.CACHES['default']['BACKEND']
+    if settings.DEBUG or backend != LOCMEM_BACKEND:
+        return []
+    return [checks.Error(
+        f'{backend} не общий для процессов: ответы API и их ETag '
+        'останутся устаревшими после изменений в других процессах.',
+        hint=(
+            'Укажите CACHE_BACKEND и CACHE_LOCATION, например '
+            'django.core.cache.backends.redis.RedisCache и '
+            'redis://redis:6379/0.'
+        ),
+        id='api.E001',
+    )]
+
+
+def _namespace_key(namespace):
+    return f'api:namespace:{namespace}'
+
+
+def get_namespace_version(namespace):
+    """
+    Текущее поколение пространства имён кэша.
+    Начальное значение берётся из времени, чтобы после вытеснения
+    ключа версии из кэша старые записи не стали снова актуальными.
+    """
+    key = _namespace_key(namespace)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    # Кэш без хранения, например DummyCache: поколение каждый раз новое.
+    return version if version is not None else time.time_ns()
+
+
+async def aget_namespace_version(namespace):
+    key = _namespace_key(namespace)
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, time.time_ns(), None)
+        version = await cache.aget(key)
+    return version if version is not None else time.time_ns()
+
+
+def bump_namespace(*namespaces):
+    """Инвалидация всех ответов пространства имён без удаления ключей."""
+    for namespace in namespaces:
+        try:
+            cache.incr(_namespace_key(namespace))
+        except ValueError:
+            get_namespace_version(namespace)
+
+
+def bump_namespace_on_commit(*namespaces):
+    """
+    bump_namespace после фиксации текущей транзакции: новое поколение
+    не должно закэшировать данные, которые ещё не видны читателям.
+    """
+    transaction.on_commit(lambda: bump_namespace(*namespaces))
+
+
+def _response_cache_key(request, versions):
+    params = sorted(
+        (key, value) for key, values in request.query_params.lists()
+        for value in values
+    )
+    raw = repr((versions, request.get_host(), request.path, params))
+    digest = hashlib.md5(raw.encode(), usedforsecurity=False).hexdigest()
+    return f'api:response:{digest}'
+
+
+def response_cache_key(request, namespaces):
+    return _response_cache_key(request, [
+        get_namespace_version(namespace) for namespace in namespaces
+    ])
+
+
+async def aresponse_cache_key(request, namespaces):
+    return _response_cache_key(request, [
+        await aget_namespace_version(namespace) for namespace in namespaces
+    ])
+
+
+class AnonymousCacheMixin:
+    """
+    Кэш ответов на GET-запросы анонимов.
+    Ключ строится из пути и нормализованных параметров запроса и
+    включает версии cache_namespaces, которые увеличиваются при
+    изменении данных.
+    """
+
+    cache_namespaces = ()
+
+    def cached_response(self, request, build_response):
+        if request.method != 'GET' or request.user.is_authenticated:
+            return build_response()
+        key = response_cache_key(request, self.cache_namespaces)
+        data = cache.get(key)
+        if data is not None:
+            return Response(data)
+        response = build_response()
+        if response.status_code == 200:
+            cache.set(key, response.data, settings.API_CACHE_TIMEOUT)
+        return response
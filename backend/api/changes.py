@@ -0,0 +1,78 @@
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+
+from django.db.models import Q
+from django.utils import timezone
+from recipes.models import DeletedRecipe, Recipe
+
+from .constants import CHANGES_PAGE_SIZE, CHANGES_SETTLE_SECONDS
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def encode_cursor(moment, pk):
+    """
+    Курсор синхронизации: время в микросекундах от начала эпохи
+    и id рецепта, на котором остановилась страница.
+    """
+    return f'{(moment - EPOCH) // timedelta(microseconds=1)}-{pk}'
+
+
+def decode_cursor(cursor):
+    """Разбор курсора в пару (время, id), None если он не передан."""
+    if not cursor:
+        return None
+    micros, _, pk = cursor.partition('-')
+    try:
+        return (
+            EPOCH + timedelta(microseconds=int(micros)),
+            int(pk) if pk else 0,
+        )
+    except (ValueError, OverflowError):
+        raise ValueError(f'Неверный курсор: {cursor}')
+
+
+def after_cursor(queryset, moment_field, pk_field, since):
+    if since is None:
+        return queryset
+    moment, pk = since
+    return queryset.filter(
+        Q(**{f'{moment_field}__gt': moment})
+        | Q(**{moment_field: moment, f'{pk_field}__gt': pk})
+    )
+
+
+def get_changes(since=None, page_size=CHANGES_PAGE_SIZE):
+    """
+    Страница изменённых и удалённых рецептов после курсора since.
+    Изменения идут в порядке (время, id) по индексам updated_at
+    и deleted_at, курсор указывает на последнее попавшее в страницу.
+    Последние CHANGES_SETTLE_SECONDS секунд не отдаются: время изменения
+    ставится до фиксации транзакции, и запись, зафиксированная позже
+    соседней, иначе оказалась бы позади уже выданного курсора.
+    """
+    horizon = timezone.now() - timedelta(seconds=CHANGES_SETTLE_SECONDS)
+    changed = after_cursor(
+        Recipe.objects.filter(updated_at__lte=horizon),
+        'updated_at', 'pk', since,
+    ).order_by('updated_at', 'pk').values_list('updated_at', 'pk')
+    deleted = after_cursor(
+        DeletedRecipe.objects.filter(deleted_at__lte=horizon),
+        'deleted_at', 'recipe_id', since,
+    ).order_by('deleted_at', 'recipe_id').values_list(
+        'deleted_at', 'recipe_id'
+    )
+    rows = sorted(
+        [(*row, 'changed') for row in changed[:page_size + 1]]
+        + [(*row, 'deleted') for row in deleted[:page_size + 1]]
+    )
+    page = rows[:page_size]
+    result = {'changed': [], 'deleted': []}
+    for _, pk, kind in page:
+        result[kind].append(pk)
+    if page:
+        result['cursor'] = encode_cursor(*page[-1][:2])
+    else:
+        result['cursor'] = encode_cursor(*since) if since else None
+    result['has_more'] = len(rows) > page_size
+    return result
@@ -0,0 +1,178 @@
+import hashlib
+from calendar import timegm
+
+from django.db.models import Count, Exists, IntegerField, Max, OuterRef
+from django.db.models import Subquery
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+from recipes.models import Cart, Favorite, Recipe
+from users.models import Follow
+
+from .cache import (RECIPES_NAMESPACE, aget_namespace_version,
+                    get_namespace_version)
+from .fast_serializers import annotate_recipe_flags
+from .serializers import RecipeReadSerializer
+
+USER_STATE_MODELS = (Favorite, Cart, Follow)
+
+
+def make_etag(*parts):
+    return quote_etag(
+        hashlib.md5(repr(parts).encode(), usedforsecurity=False).hexdigest()
+    )
+
+
+def _normalized_query(request):
+    return sorted(
+        (key, value) for key, values in request.query_params.lists()
+        for value in values
+    )
+
+
+def _user_state_subquery(model, aggregate):
+    """Подзапрос с агрегатом по строкам model пользователя."""
+    rows = (
+        model.objects.filter(user=OuterRef('pk'))
+        .order_by()
+        .values('user')
+        .annotate(value=aggregate)
+        .values('value')
+    )
+    return Subquery(rows, output_field=IntegerField())
+
+
+def _user_state_queryset(user):
+    annotations = {}
+    for model in USER_STATE_MODELS:
+        name = model._meta.model_name
+        annotations[f'{name}_count'] = _user_state_subquery(
+            model, Count('pk')
+        )
+        annotations[f'{name}_max'] = _user_state_subquery(model, Max('pk'))
+    return (
+        type(user).objects.filter(pk=user.pk)
+        .annotate(**annotations)
+        .values_list(*annotations)
+    )
+
+
+def get_user_state(user):
+    """
+    Отпечаток избранного, корзины и подписок пользователя.
+    Количество и максимальный id строк меняются при любом добавлении
+    или удалении, что достаточно для инвалидации флагов в ответах.
+    """
+    if not user.is_authenticated:
+        return None
+    return user.pk, _user_state_queryset(user).first()
+
+
+async def aget_user_state(user):
+    if not user.is_authenticated:
+        return None
+    return user.pk, await _user_state_queryset(user).afirst()
+
+
+def _recipe_state_queryset(request, pk):
+    user = request.user
+    queryset = annotate_recipe_flags(
+        Recipe.objects.filter(pk=pk), user, RecipeReadSerializer.Meta.fields
+    )
+    columns = ['pk', 'version', 'updated_at']
+    if user.is_authenticated:
+        queryset = queryset.annotate(is_subscribed=Exists(
+            Follow.objects.filter(user=user, author=OuterRef('author'))
+        ))
+        columns += ['is_favorited', 'is_in_shopping_cart', 'is_subscribed']
+    return queryset.values(*columns)
+
+
+def _fill_flags(state):
+    if state is not None:
+        for flag in ('is_favorited', 'is_in_shopping_cart', 'is_subscribed'):
+            state.setdefault(flag, False)
+    return state
+
+
+def get_recipe_state(request, pk):
+    """
+    Версия рецепта и флаги пользователя одним запросом.
+    Возвращает None, если рецепта нет.
+    """
+    return _fill_flags(_recipe_state_queryset(request, pk).first())
+
+
+async def aget_recipe_state(request, pk):
+    return _fill_flags(await _recipe_state_queryset(request, pk).afirst())
+
+
+def get_detail_validators(request, state):
+    """ETag и Last-Modified рецепта по счётчику версии."""
+    etag = make_etag(
+        sorted(state.items()), request.user.pk, request.get_host(),
+        _normalized_query(request),
+    )
+    return etag, state['updated_at']
+
+
+def _list_validators(request, version, user_state):
+    etag = make_etag(
+        version, user_state, request.get_host(), _normalized_query(request),
+    )
+    return etag, None
+
+
+def get_list_validators(request):
+    """
+    ETag страницы списка рецептов по поколению кэша рецептов.
+    Поколение растёт при любом изменении рецептов, их ингредиентов,
+    тегов и авторов, поэтому таблицу рецептов читать не нужно.
+    Last-Modified у списка нет: поколение не является временем.
+    """
+    return _list_validators(
+        request,
+        get_namespace_version(RECIPES_NAMESPACE),
+        get_user_state(request.user),
+    )
+
+
+async def aget_list_validators(request):
+    return _list_validators(
+        request,
+        await aget_namespace_version(RECIPES_NAMESPACE),
+        await aget_user_state(request.user),
+    )
+
+
+def conditional_response(request, validators):
+    """Ответ 304, если клиент прислал актуальные валидаторы."""
+    etag, last_modified = validators
+    response = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=_last_modified(request, last_modified),
+    )
+    if response is not None:
+        set_validators(request, response, validators)
+    return response
+
+
+def set_validators(request, response, validators):
+    """
+    Заголовки ETag и Last-Modified.
+    Last-Modified не учитывает флаги пользователя, поэтому
+    отдаётся только анонимам.
+    """
+    etag, last_modified = validators
+    response['ETag'] = etag
+    last_modified = _last_modified(request, last_modified)
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    patch_vary_headers(response, ('Authorization',))
+    return response
+
+
+def _last_modified(request, moment):
+    if moment is None or request.user.is_authenticated:
+        return None
+    return timegm(moment.utctimetuple())
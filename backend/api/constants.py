@@ -2,3 +2,46 @@ MIN_COOKING_TIME = 1
 MAX_COOKING_TIME = 32000
 MIN_INGREDIENT_AMOUNT = 1
 MAX_INGREDIENT_AMOUNT = 32000
+EXPORT_CHUNK_SIZE = 500
+IMPORT_CHUNK_SIZE = 200
+CHANGES_PAGE_SIZE = 1000
+CHANGES_SETTLE_SECONDS = 10
+IMPORT_WORKERS = 4
+FEED_FANOUT_LIMIT = 1000
+FEED_BATCH_SIZE = 500
+FEED_BACKFILL_LIMIT = 50
+FEED_PULL_AUTHORS_TIMEOUT = 300
+SUGGESTIONS_LIMIT = 20
+SUGGESTIONS_NEIGHBOURS = 200
+SUGGESTIONS_FAVORITE_WEIGHT = 0.5
+SUGGESTIONS_REFRESH_DELAY = 300
+EVENTS_HEARTBEAT = 15
+EVENTS_QUEUE_SIZE = 100
+EVENTS_TICKET_MAX_AGE = 60
+IMAGE_VARIANTS = {
+    'thumbnail': 320,
+    'medium': 800,
+    'large': 1600,
+}
+IMAGE_VARIANTS_DIR = 'food/variants/'
+IMAGE_WEBP_QUALITY = 80
+UPLOAD_MAX_BYTES = 5 * 1024 * 1024
+UPLOAD_MAX_PIXELS = 25_000_000
+UPLOAD_SPOOL_SIZE = 1024 * 1024
+UPLOAD_DECODE_CHUNK = 64 * 1024
+DELETE_BATCH_SIZE = 500
+MEDIA_GC_DIRECTORIES = ('food/', 'avatars/')
+MEDIA_GC_MIN_AGE_HOURS = 24
+SHORT_LINK_LENGTH = 6
+SHORT_LINK_ATTEMPTS = 5
+SHORT_LINK_CACHE_SIZE = 10000
+REPLICA_PIN_SECONDS = 5
+REPLICA_RETRY_SECONDS = 30
+REPLICA_CHECK_SECONDS = 5
+EXPLAIN_MIN_ROWS = 1000
+EXPLAIN_RECIPES_PER_AUTHOR = 20
+EXPLAIN_INGREDIENTS = 200
+EXPLAIN_TAGS = 8
+EXPLAIN_FOLLOWS = 20
+PROFILER_KEEP = 100
+PROFILER_TOP_FUNCTIONS = 40
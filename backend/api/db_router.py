@@ -0,0 +1,218 @@
+import asyncio
+import hashlib
+import logging
+import random
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import (DEFAULT_DB_ALIAS, DatabaseError, InterfaceError,
+                       OperationalError, connections)
+from rest_framework.permissions import SAFE_METHODS
+
+from .constants import (REPLICA_CHECK_SECONDS, REPLICA_PIN_SECONDS,
+                        REPLICA_RETRY_SECONDS)
+
+logger = logging.getLogger(__name__)
+
+# Модели, которые всегда читаются с основной базы: токен нужен сразу
+# после входа, короткая ссылка создаётся при чтении и должна сразу
+# находиться, а очередь задач не терпит отставания.
+PRIMARY_ONLY_MODELS = frozenset(
+    ('authtoken.token', 'recipes.shortlink', 'jobs.job')
+)
+
+_use_replica = ContextVar('use_replica', default=False)
+_replicas_used = ContextVar('replicas_used', default=None)
+_down_until = {}
+_checked_until = {}
+_down_lock = threading.Lock()
+
+
+def _in_event_loop():
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+def mark_down(alias, error):
+    """Реплика пропускается REPLICA_RETRY_SECONDS секунд."""
+    logger.warning('Реплика %s недоступна: %s', alias, error)
+    with _down_lock:
+        _down_until[alias] = time.monotonic() + REPLICA_RETRY_SECONDS
+        _checked_until.pop(alias, None)
+
+
+def _is_available(alias):
+    """
+    Доступность реплики. Успешная проверка соединения запоминается на
+    REPLICA_CHECK_SECONDS секунд, чтобы не проверять его при каждом
+    выборе базы.
+    """
+    now = time.monotonic()
+    with _down_lock:
+        if _down_until.get(alias, 0) > now:
+            return False
+        if _checked_until.get(alias, 0) > now:
+            return True
+    if _in_event_loop():
+        # Соединение нельзя открыть из async-кода, поэтому реплика
+        # берётся без проверки; недоступность отмечают синхронные запросы.
+        return True
+    try:
+        connections[alias].ensure_connection()
+    except DatabaseError as error:
+        mark_down(alias, error)
+        return False
+    with _down_lock:
+        _checked_until[alias] = now + REPLICA_CHECK_SECONDS
+    return True
+
+
+def choose_replica():
+    """
+    Случайная доступная реплика или None.
+    Недоступная реплика пропускается REPLICA_RETRY_SECONDS секунд.
+    """
+    replicas = list(settings.REPLICA_DATABASES)
+    random.shuffle(replicas)
+    for alias in replicas:
+        if _is_available(alias):
+            return alias
+    return None
+
+
+class ReplicaRouter:
+    """
+    Чтение в безопасных запросах к API с реплик, всё остальное
+    с основной базы. Чтения внутри транзакции и вне размеченных
+    ReplicaMiddleware запросов (команды, обработчики задач) идут
+    на основную базу.
+    """
+
+    def db_for_read(self, model, **hints):
+        if not _use_replica.get():
+            return None
+        if model._meta.label_lower in PRIMARY_ONLY_MODELS:
+            return None
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        alias = choose_replica()
+        used = _replicas_used.get()
+        if alias is not None and used is not None:
+            used.add(alias)
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+def _pin_key(request):
+    """
+    Клиент для закрепления за основной базой: по токену, а анонимы
+    по адресу, чтобы после регистрации вход читал свежие данные.
+    """
+    client = request.headers.get('Authorization') or request.META.get(
+        'HTTP_X_REAL_IP', request.META.get('REMOTE_ADDR', '')
+    )
+    digest = hashlib.md5(client.encode(), usedforsecurity=False).hexdigest()
+    return f'db:pin:{digest}'
+
+
+class ReplicaMiddleware:
+    """
+    Разметка запросов для ReplicaRouter.
+    После изменяющего запроса клиент REPLICA_PIN_SECONDS секунд читает
+    с основной базы и видит свои изменения несмотря на отставание
+    реплик. Закрепления хранятся в общем кэше (проверка api.E001) и
+    действуют во всех веб-процессах. Если реплика отказала посреди
+    запроса, она отмечается недоступной, а безопасный запрос
+    повторяется на основной базе. Без настроенных реплик middleware
+    отключается. Работает и в синхронной, и в асинхронной цепочке
+    middleware.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.REPLICA_DATABASES:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    @staticmethod
+    def use_replica(request, pinned):
+        return (
+            _use_replica.set(
+                request.method in SAFE_METHODS
+                and request.path.startswith('/api/')
+                and not pinned
+            ),
+            _replicas_used.set(set()),
+        )
+
+    @staticmethod
+    def reset(tokens):
+        use_token, used_token = tokens
+        _use_replica.reset(use_token)
+        _replicas_used.reset(used_token)
+
+    def process_exception(self, request, exception):
+        used = _replicas_used.get()
+        if used and isinstance(exception, (InterfaceError, OperationalError)):
+            for alias in used:
+                mark_down(alias, exception)
+            request._replica_failed = True
+        return None
+
+    def respond(self, request, pinned):
+        tokens = self.use_replica(request, pinned)
+        try:
+            return self.get_response(request)
+        finally:
+            self.reset(tokens)
+
+    async def arespond(self, request, pinned):
+        tokens = self.use_replica(request, pinned)
+        try:
+            return await self.get_response(request)
+        finally:
+            self.reset(tokens)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        key = _pin_key(request)
+        response = self.respond(request, cache.get(key) is not None)
+        if getattr(request, '_replica_failed', False):
+            request._replica_failed = False
+            response = self.respond(request, True)
+        if request.method not in SAFE_METHODS:
+            cache.set(key, 1, REPLICA_PIN_SECONDS)
+        return response
+
+    async def __acall__(self, request):
+        key = _pin_key(request)
+        response = await self.arespond(
+            request, await cache.aget(key) is not None
+        )
+        if getattr(request, '_replica_failed', False):
+            request._replica_failed = False
+            response = await self.arespond(request, True)
+        if request.method not in SAFE_METHODS:
+            await cache.aset(key, 1, REPLICA_PIN_SECONDS)
+        return response
@@ -0,0 +1,162 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+from jobs.queue import enqueue, report_progress
+from recipes.models import (Cart, DeletedRecipe, Favorite, FeedEntry, Recipe,
+                            RecipeTag)
+from rest_framework.authtoken.models import Token
+from users.models import AuthorSimilarity, Follow
+
+from .cache import RECIPES_NAMESPACE, bump_namespace_on_commit
+from .constants import DELETE_BATCH_SIZE
+
+User = get_user_model()
+
+# Зависимые строки рецепта, число которых не ограничено: они удаляются
+# пачками до удаления самого рецепта.
+RECIPE_DEPENDENTS = (
+    (FeedEntry, 'recipe'),
+    (Favorite, 'recipe'),
+    (Cart, 'recipe'),
+    (RecipeTag, 'recipe'),
+)
+USER_DEPENDENTS = (
+    (FeedEntry, 'user'),
+    (FeedEntry, 'author'),
+    (Favorite, 'user'),
+    (Cart, 'user'),
+    (Follow, 'user'),
+    (Follow, 'author'),
+    (AuthorSimilarity, 'author'),
+    (AuthorSimilarity, 'similar'),
+)
+
+
+def _hide_recipes(queryset, moment):
+    """Скрытие рецептов и запись их в журнал удалений для /changes/."""
+    ids = list(queryset.values_list('pk', flat=True))
+    Recipe.all_objects.filter(pk__in=ids).update(deleted_at=moment)
+    DeletedRecipe.objects.bulk_create(
+        DeletedRecipe(recipe_id=pk) for pk in ids
+    )
+    bump_namespace_on_commit(RECIPES_NAMESPACE)
+    return ids
+
+
+def hide_recipe(recipe):
+    """
+    Рецепт сразу пропадает из API, а строки удаляются задачей
+    purge_recipe после фиксации транзакции.
+    """
+    with transaction.atomic():
+        _hide_recipes(Recipe.objects.filter(pk=recipe.pk), timezone.now())
+        enqueue(purge_recipe, recipe.pk)
+
+
+def hide_user(user):
+    """
+    Пользователь теряет доступ и пропадает из API вместе с рецептами,
+    удаление строк выполняет задача purge_user.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        User.objects.filter(pk=user.pk).update(
+            deleted_at=now, is_active=False
+        )
+        Token.objects.filter(user=user).delete()
+        _hide_recipes(Recipe.objects.filter(author=user), now)
+        enqueue(purge_user, user.pk)
+
+
+class HideOnDeleteMixin:
+    """
+    Удаление в админке через скрытие и фоновое удаление строк: каскад
+    не собирается в памяти ни для страницы подтверждения, ни для
+    самого удаления. Подкласс задаёт hide: hide_recipe или hide_user.
+    """
+
+    hide = None
+
+    def get_deleted_objects(self, objs, request):
+        objs = list(objs)
+        opts = self.model._meta
+        perms_needed = set()
+        if not self.has_delete_permission(request):
+            perms_needed.add(opts.verbose_name)
+        return (
+            [str(obj) for obj in objs],
+            {opts.verbose_name_plural: len(objs)},
+            perms_needed,
+            [],
+        )
+
+    def delete_model(self, request, obj):
+        self.hide(obj)
+
+    def delete_queryset(self, request, queryset):
+        for obj in queryset:
+            self.hide(obj)
+
+
+def delete_in_batches(queryset, batch_size=DELETE_BATCH_SIZE, progress=None):
+    """
+    Удаление строк queryset пачками по первичному ключу, каждая пачка
+    в своей транзакции. Возвращает число удалённых строк.
+    """
+    total = 0
+    while True:
+        ids = list(queryset.values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return total
+        with transaction.atomic():
+            queryset.model._base_manager.filter(pk__in=ids).delete()
+        total += len(ids)
+        if progress is not None:
+            progress(total)
+
+
+def purge_dependents(dependents, value, progress):
+    for model, field in dependents:
+        name = f'{model._meta.model_name}.{field}'
+        delete_in_batches(
+            model._base_manager.filter(**{field: value}),
+            progress=lambda done: progress(table=name, deleted=done),
+        )
+
+
+def purge_recipe(recipe_id):
+    """Удаление скрытого рецепта: сначала зависимые строки, затем он сам."""
+    recipe = Recipe.all_objects.filter(
+        pk=recipe_id, deleted_at__isnull=False
+    ).first()
+    if recipe is None:
+        return
+    purge_dependents(
+        RECIPE_DEPENDENTS, recipe_id,
+        lambda **step: report_progress(recipe=recipe_id, **step),
+    )
+    recipe.delete()
+
+
+def purge_user(user_id):
+    """
+    Удаление скрытого пользователя: рецепты по одному с пачками
+    зависимых строк, затем его подписки, избранное и лента.
+    """
+    if not User.objects.filter(pk=user_id, deleted_at__isnull=False).exists():
+        return
+    recipe_ids = list(
+        Recipe.all_objects.filter(author_id=user_id)
+        .values_list('pk', flat=True)
+    )
+    total = len(recipe_ids)
+    for number, recipe_id in enumerate(recipe_ids, start=1):
+        purge_recipe(recipe_id)
+        report_progress(recipes=number, recipes_total=total)
+    purge_dependents(
+        USER_DEPENDENTS, user_id,
+        lambda **step: report_progress(
+            recipes=total, recipes_total=total, **step
+        ),
+    )
+    User.objects.filter(pk=user_id).delete()
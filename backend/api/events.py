@@ -0,0 +1,279 @@
+import asyncio
+import json
+import logging
+import secrets
+import threading
+import time
+from collections import defaultdict
+from functools import lru_cache
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import checks, signing
+from django.core.cache import cache
+from django.db import transaction
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils.module_loading import import_string
+from rest_framework.authtoken.models import Token
+from users.models import Follow
+
+from .constants import (EVENTS_HEARTBEAT, EVENTS_QUEUE_SIZE,
+                        EVENTS_TICKET_MAX_AGE)
+
+User = get_user_model()
+
+logger = logging.getLogger(__name__)
+
+RECIPE_CREATED = 'recipe_created'
+RECIPE_UPDATED = 'recipe_updated'
+EVENTS_TICKET_SALT = 'api.events.ticket'
+IN_PROCESS_BACKEND = 'api.events.InProcessBackend'
+
+
+def author_channel(author_id):
+    return f'author:{author_id}'
+
+
+class Subscription:
+    """
+    Очередь событий одного подключения.
+    Создаётся в цикле событий, а наполняется из любого потока.
+    """
+
+    def __init__(self, channels, maxsize=EVENTS_QUEUE_SIZE):
+        self.channels = tuple(channels)
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize)
+
+    def put(self, message):
+        try:
+            self.loop.call_soon_threadsafe(self._put, message)
+        except RuntimeError:
+            # Цикл событий уже закрыт, подключения больше нет.
+            pass
+
+    def _put(self, message):
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # Медленный клиент теряет события, а не память сервера.
+            pass
+
+    async def get(self, timeout):
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+
+class InProcessBackend:
+    """
+    Брокер событий в памяти процесса.
+    Подписчики получают только события, опубликованные в том же
+    процессе. Для нескольких процессов нужен бэкенд с тем же
+    интерфейсом (publish, subscribe, unsubscribe) поверх общей шины,
+    он подключается настройкой EVENTS_BACKEND.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = defaultdict(set)
+
+    def publish(self, channel, message):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(channel, ()))
+        for subscription in subscriptions:
+            subscription.put(message)
+
+    def subscribe(self, channels):
+        subscription = Subscription(channels)
+        with self._lock:
+            for channel in subscription.channels:
+                self._subscriptions[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for channel in subscription.channels:
+                subscribers = self._subscriptions.get(channel)
+                if subscribers is None:
+                    continue
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscriptions[channel]
+
+
+class RedisBackend(InProcessBackend):
+    """
+    Брокер событий поверх Redis pub/sub для нескольких процессов.
+    publish отправляет событие в Redis, а поток-слушатель, который
+    запускается при первой подписке, раздаёт его подписчикам своего
+    процесса.
+    """
+
+    prefix = 'foodgram:events:'
+
+    def __init__(self):
+        import redis
+
+        super().__init__()
+        self.client = redis.Redis.from_url(settings.EVENTS_REDIS_URL)
+        self.errors = redis.RedisError
+        self._listener = None
+
+    def publish(self, channel, message):
+        try:
+            self.client.publish(
+                f'{self.prefix}{channel}',
+                json.dumps(message, ensure_ascii=False)
+            )
+        except self.errors as error:
+            # Событие теряется, но запрос, который его вызвал, уже
+            # зафиксирован и не должен падать.
+            logger.warning('Событие %s не опубликовано: %s', channel, error)
+
+    def subscribe(self, channels):
+        with self._lock:
+            if self._listener is None:
+                pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+                pubsub.psubscribe(**{f'{self.prefix}*': self._dispatch})
+                self._listener = pubsub.run_in_thread(
+                    sleep_time=1, daemon=True,
+                    exception_handler=self._reconnect
+                )
+        return super().subscribe(channels)
+
+    def _dispatch(self, message):
+        channel = message['channel'].decode()[len(self.prefix):]
+        super().publish(channel, json.loads(message['data']))
+
+    @staticmethod
+    def _reconnect(error, pubsub, thread):
+        # Подписка восстанавливается при следующем чтении.
+        logger.warning('Нет соединения с Redis для событий: %s', error)
+        time.sleep(1)
+
+
+@lru_cache(maxsize=None)
+def get_broker():
+    return import_string(settings.EVENTS_BACKEND)()
+
+
+def notify_followers(recipe, event):
+    """Уведомление подписчиков автора после фиксации транзакции."""
+    message = {
+        'event': event, 'recipe': recipe.pk, 'author': recipe.author_id
+    }
+    transaction.on_commit(
+        lambda: get_broker().publish(author_channel(recipe.author_id), message)
+    )
+
+
+def format_event(message):
+    data = json.dumps(message, ensure_ascii=False)
+    return f'event: {message["event"]}\ndata: {data}\n\n'
+
+
+async def stream_events(channels, heartbeat=EVENTS_HEARTBEAT):
+    """
+    Поток SSE. Комментарий-пинг раз в heartbeat секунд держит
+    соединение открытым через прокси и выявляет отключившихся клиентов.
+    """
+    broker = get_broker()
+    subscription = broker.subscribe(channels)
+    try:
+        yield 'retry: 5000\n\n'
+        while True:
+            try:
+                message = await subscription.get(heartbeat)
+            except asyncio.TimeoutError:
+                yield ': ping\n\n'
+                continue
+            yield format_event(message)
+    finally:
+        broker.unsubscribe(subscription)
+
+
+def _ticket_key(nonce):
+    return f'api:events:ticket:{nonce}'
+
+
+def make_ticket(user):
+    """
+    Одноразовый билет для EventSource: браузер не умеет передавать
+    заголовки, а постоянный токен в адресе попадает в логи. Билет
+    действует EVENTS_TICKET_MAX_AGE секунд и до первого использования:
+    его случайная часть лежит в общем кэше и удаляется при входе.
+    """
+    nonce = secrets.token_urlsafe()
+    cache.set(_ticket_key(nonce), user.pk, EVENTS_TICKET_MAX_AGE)
+    return signing.dumps(
+        {'user': user.pk, 'nonce': nonce}, salt=EVENTS_TICKET_SALT
+    )
+
+
+async def get_token_user(request):
+    """Пользователь по токену из заголовка Authorization."""
+    header = request.headers.get('Authorization', '').split()
+    if len(header) != 2 or header[0] != 'Token':
+        return None
+    token = await Token.objects.select_related('user').filter(
+        key=header[1], user__is_active=True
+    ).afirst()
+    return token.user if token is not None else None
+
+
+async def get_event_user(request):
+    """Пользователь по токену или по билету make_ticket из параметра."""
+    ticket = request.GET.get('ticket')
+    if not ticket:
+        return await get_token_user(request)
+    try:
+        payload = signing.loads(
+            ticket, salt=EVENTS_TICKET_SALT, max_age=EVENTS_TICKET_MAX_AGE
+        )
+    except signing.BadSignature:
+        return None
+    if not await cache.adelete(_ticket_key(payload['nonce'])):
+        return None
+    return await User.objects.filter(
+        pk=payload['user'], is_active=True
+    ).afirst()
+
+
+def check_events_backend(app_configs, **kwargs):
+    """
+    События публикуют веб-процессы и воркер, а отдаёт отдельный
+    ASGI-сервис, поэтому брокер в памяти процесса их не доставит.
+    """
+    if settings.DEBUG or settings.EVENTS_BACKEND != IN_PROCESS_BACKEND:
+        return []
+    return [checks.Error(
+        f'{IN_PROCESS_BACKEND} доставляет события только внутри '
+        'процесса, а подписчики подключены к ASGI-сервису.',
+        hint=(
+            'Укажите EVENTS_BACKEND=api.events.RedisBackend и '
+            'EVENTS_REDIS_URL, например redis://redis:6379/1.'
+        ),
+        id='api.E002',
+    )]
+
+
+async def recipe_events(request):
+    """
+    События о новых и изменённых рецептах авторов из подписок.
+    Список авторов фиксируется при подключении; после подписки
+    или отписки клиент переподключается.
+    """
+    user = await get_event_user(request)
+    if user is None:
+        return JsonResponse(
+            {'detail': 'Учетные данные не были предоставлены.'}, status=401
+        )
+    channels = [
+        author_channel(author_id) async for author_id in
+        Follow.objects.filter(user=user).values_list('author', flat=True)
+    ]
+    response = StreamingHttpResponse(
+        stream_events(channels), content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,409 @@
+import json
+import re
+from collections import namedtuple
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.db import connection, models
+from django.db.migrations import AddIndex, Migration
+from django.db.migrations.autodetector import MigrationAutodetector
+from django.db.migrations.loader import MigrationLoader
+from django.db.migrations.writer import MigrationWriter
+from django.db.models import Count
+from recipes.models import (Cart, Favorite, Ingredient, IngredientAmount,
+                            Recipe, RecipeTag, Tag)
+from users.models import Follow
+
+from .constants import (EXPLAIN_FOLLOWS, EXPLAIN_INGREDIENTS,
+                        EXPLAIN_RECIPES_PER_AUTHOR, EXPLAIN_TAGS)
+
+User = get_user_model()
+
+# Канонические запросы API и нужна ли для них авторизация.
+ENDPOINTS = (
+    ('/api/tags/', False),
+    ('/api/ingredients/?name={ingredient}', False),
+    ('/api/recipes/', False),
+    ('/api/recipes/?author={author}', False),
+    ('/api/recipes/?tags={tag}', False),
+    ('/api/recipes/{recipe}/', False),
+    ('/api/recipes/?is_favorited=1', True),
+    ('/api/recipes/?is_in_shopping_cart=1', True),
+    ('/api/recipes/download_shopping_cart/', True),
+    ('/api/users/subscriptions/', True),
+    ('/api/feed/', True),
+)
+
+SEQ_SCAN = 'seq_scan'
+SORT = 'sort'
+NESTED_LOOP = 'nested_loop'
+
+Issue = namedtuple('Issue', ('kind', 'table', 'detail'))
+
+REF = r'(?:"(?P<table>\w+)"|\b(?P<alias>[A-Z]\d+))\."(?P<column>\w+)"'
+REF_PATTERN = re.compile(REF)
+EQUALS_LEFT = re.compile(REF + r'\s*(?:=|IN\s*\()')
+EQUALS_RIGHT = re.compile(r'=\s*\(?' + REF)
+ORDER_BY = re.compile(r'ORDER BY (.+?)(?=\s+LIMIT\b|\)|$)')
+DIRECTION = re.compile(r'\s+(ASC|DESC)\b')
+SOURCE = re.compile(r'(?:FROM|JOIN)\s+"(\w+)"(?:\s+([A-Z]\d+)\b)?')
+SQLITE_STEP = re.compile(
+    r'^(?P<op>SCAN|SEARCH) (?:TABLE )?(?P<name>\w+)(?P<rest>.*)$'
+)
+POSTGRESQL_INDEX_SCANS = frozenset(
+    ('Index Scan', 'Index Only Scan', 'Bitmap Heap Scan')
+)
+
+
+def get_endpoint_paths(authenticated):
+    """Пути канонических запросов с идентификаторами из текущих данных."""
+    recipe = Recipe.objects.values_list('pk', flat=True).first()
+    author = (
+        Recipe.objects.values('author').annotate(total=Count('pk'))
+        .order_by('-total').values_list('author', flat=True).first()
+    )
+    tag = (
+        Tag.objects.annotate(total=Count('recipe_links'))
+        .order_by('-total').values_list('slug', flat=True).first()
+    )
+    ingredient = Ingredient.objects.values_list('name', flat=True).first()
+    params = {
+        'recipe': recipe,
+        'author': author,
+        'tag': tag,
+        'ingredient': (ingredient or '')[:3],
+    }
+    if None in params.values():
+        return []
+    return [
+        path.format(**params) for path, auth_only in ENDPOINTS
+        if authenticated or not auth_only
+    ]
+
+
+class StatementCollector:
+    """execute_wrapper, запоминающий SELECT-запросы с параметрами."""
+
+    def __init__(self):
+        self.statements = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        if not many and sql.lstrip().upper().startswith('SELECT'):
+            self.statements.setdefault(sql, params)
+        return execute(sql, params, many, context)
+
+
+class PlanAnalyzer:
+    """
+    План запроса и найденные в нём проблемы: полные просмотры и
+    сортировки больших таблиц, вложенные циклы по ним.
+    PostgreSQL выполняет запрос через EXPLAIN (ANALYZE, BUFFERS),
+    SQLite только показывает план через EXPLAIN QUERY PLAN.
+    """
+
+    vendors = ('postgresql', 'sqlite')
+
+    def __init__(self, min_rows):
+        self.min_rows = min_rows
+        self.table_rows = {}
+        self.tables = set(connection.introspection.table_names())
+
+    def count_rows(self, table):
+        if table not in self.table_rows:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'SELECT COUNT(*) FROM {connection.ops.quote_name(table)}'
+                )
+                self.table_rows[table] = cursor.fetchone()[0]
+        return self.table_rows[table]
+
+    def is_large(self, table):
+        return (
+            table is not None
+            and table in self.tables
+            and self.count_rows(table) >= self.min_rows
+        )
+
+    def explain(self, sql, params):
+        """Текст плана и список Issue."""
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute(
+                    'EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) ' + sql, params
+                )
+                plan = cursor.fetchone()[0]
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                plan = plan[0]['Plan']
+                return (
+                    json.dumps(plan, indent=2, ensure_ascii=False),
+                    list(self.postgresql_issues(plan)),
+                )
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            steps = [row[-1] for row in cursor.fetchall()]
+        return '\n'.join(steps), list(self.sqlite_issues(sql, steps))
+
+    def postgresql_issues(self, node):
+        kind = node['Node Type']
+        loops = node.get('Actual Loops', 1)
+        if kind == 'Seq Scan' and self.is_large(node['Relation Name']):
+            table = node['Relation Name']
+            rows = (
+                node.get('Actual Rows', 0)
+                + node.get('Rows Removed by Filter', 0)
+            ) * loops
+            yield Issue(SEQ_SCAN, table, (
+                f'Seq Scan по {table}: {rows} строк, '
+                f'фильтр {node.get("Filter", "нет")}'
+            ))
+        elif kind in ('Sort', 'Incremental Sort'):
+            child = node['Plans'][0]
+            rows = child.get('Actual Rows', 0) * child.get('Actual Loops', 1)
+            if rows >= self.min_rows:
+                keys = node.get('Sort Key', [])
+                yield Issue(SORT, None, (
+                    f'Sort {rows} строк по {", ".join(keys)}, '
+                    f'{node.get("Sort Method", "")}'
+                ))
+        elif kind == 'Nested Loop':
+            inner = node['Plans'][-1]
+            table = self.postgresql_relation(inner)
+            if (self.is_large(table)
+                    and inner['Node Type'] not in POSTGRESQL_INDEX_SCANS):
+                yield Issue(NESTED_LOOP, table, (
+                    f'Nested Loop: {inner.get("Actual Loops", 1)} проходов '
+                    f'по {table} ({inner["Node Type"]})'
+                ))
+        for child in node.get('Plans', ()):
+            yield from self.postgresql_issues(child)
+
+    def postgresql_relation(self, node):
+        if 'Relation Name' in node:
+            return node['Relation Name']
+        for child in node.get('Plans', ()):
+            relation = self.postgresql_relation(child)
+            if relation is not None:
+                return relation
+        return None
+
+    def sqlite_issues(self, sql, steps):
+        tables = dict(
+            (alias or table, table) for table, alias in SOURCE.findall(sql)
+        )
+        loops = 0
+        for step in steps:
+            if step == 'USE TEMP B-TREE FOR ORDER BY':
+                table = next(iter(get_order_columns(sql)), (None,))[0]
+                if self.is_large(table):
+                    yield Issue(SORT, table, f'Сортировка {table} в памяти')
+                continue
+            match = SQLITE_STEP.match(step)
+            if match is None:
+                continue
+            loops += 1
+            table = tables.get(match['name'], match['name'])
+            if match['op'] != 'SCAN' or 'INDEX' in match['rest']:
+                continue
+            if not self.is_large(table):
+                continue
+            if loops > 1:
+                yield Issue(NESTED_LOOP, table, (
+                    f'Вложенный цикл с полным просмотром {table}'
+                ))
+            else:
+                yield Issue(SEQ_SCAN, table, f'Полный просмотр {table}')
+
+
+def _resolve(sql, match):
+    """Таблица ссылки на колонку с учётом псевдонимов подзапросов."""
+    if match['table'] is not None:
+        return match['table']
+    table = None
+    for source in SOURCE.finditer(sql):
+        if source[2] != match['alias']:
+            continue
+        if table is not None and source.start() > match.start():
+            break
+        table = source[1]
+    return table
+
+
+def get_equality_columns(sql):
+    """(таблица, колонка) из условий равенства и IN по порядку."""
+    found = []
+    matches = sorted(
+        [*EQUALS_LEFT.finditer(sql), *EQUALS_RIGHT.finditer(sql)],
+        key=lambda match: match.start('column'),
+    )
+    for match in matches:
+        column = (_resolve(sql, match), match['column'])
+        if column not in found:
+            found.append(column)
+    return found
+
+
+def get_order_columns(sql):
+    """(таблица, колонка, убывание) из ORDER BY."""
+    found = []
+    for clause in ORDER_BY.finditer(sql):
+        refs = REF_PATTERN.finditer(sql, clause.start(1), clause.end(1))
+        for match in refs:
+            direction = DIRECTION.match(sql, match.end())
+            found.append((
+                _resolve(sql, match),
+                match['column'],
+                direction is not None and direction[1] == 'DESC',
+            ))
+    return found
+
+
+def get_models_by_table():
+    return {
+        model._meta.db_table: model for model in apps.get_models()
+        if model._meta.managed and not model._meta.auto_created
+    }
+
+
+def _existing_indexes(table):
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(cursor, table)
+    return [
+        constraint['columns'] for constraint in constraints.values()
+        if constraint['index'] or constraint['unique']
+        or constraint['primary_key']
+    ]
+
+
+def suggest_index(sql, issue):
+    """
+    Индекс для проблемы плана или None: колонки равенства таблицы,
+    затем колонки её сортировки. Индексы, которые уже начинаются с
+    этих колонок, не предлагаются.
+    """
+    order = get_order_columns(sql)
+    table = issue.table or next(iter(order), (None,))[0]
+    model = get_models_by_table().get(table)
+    if model is None:
+        return None
+    pk = model._meta.pk.column
+    columns = [
+        column for column_table, column in get_equality_columns(sql)
+        if column_table == table and column != pk
+    ]
+    descending = set()
+    if issue.kind != NESTED_LOOP:
+        for column_table, column, desc in order:
+            if column_table == table and column not in columns:
+                columns.append(column)
+                if desc:
+                    descending.add(column)
+    if not columns:
+        return None
+    for existing in _existing_indexes(table):
+        if existing[:len(columns)] == columns:
+            return None
+    names = {field.column: field.name for field in model._meta.fields}
+    return model, tuple(
+        ('-' if column in descending else '') + names[column]
+        for column in columns if column in names
+    )
+
+
+def make_index(model, fields):
+    index = models.Index(fields=list(fields))
+    index.set_name_with_model(model)
+    return index
+
+
+def write_index_migrations(suggestions):
+    """
+    Миграции с предложенными индексами по одной на приложение.
+    Возвращает пути записанных файлов.
+    """
+    loader = MigrationLoader(None, ignore_no_migrations=True)
+    by_app = {}
+    for model, fields in suggestions:
+        by_app.setdefault(model._meta.app_label, []).append(
+            AddIndex(model._meta.model_name, make_index(model, fields))
+        )
+    paths = []
+    for app_label, operations in sorted(by_app.items()):
+        leaves = loader.graph.leaf_nodes(app_label)
+        if len(leaves) != 1:
+            raise ValueError(
+                f'У приложения {app_label} не одна последняя миграция.'
+            )
+        number = MigrationAutodetector.parse_number(leaves[0][1]) or 0
+        migration = Migration(
+            f'{number + 1:04d}_explain_api_indexes', app_label
+        )
+        migration.dependencies = leaves
+        migration.operations = operations
+        writer = MigrationWriter(migration)
+        with open(writer.path, 'w', encoding='utf-8') as file:
+            file.write(writer.as_string())
+        paths.append(writer.path)
+    return paths
+
+
+def seed_dataset(recipes):
+    """
+    Синтетические данные для планов на объёме: авторы, ингредиенты,
+    теги, рецепты со связями, подписки, избранное и корзина первого
+    пользователя. Вызывается внутри откатываемой транзакции и
+    возвращает этого пользователя.
+    """
+    users = User.objects.bulk_create(
+        User(
+            username=f'explain{number}',
+            email=f'explain{number}@example.com',
+            first_name='Explain',
+            last_name='Explain',
+            password='!',
+        )
+        for number in range(max(recipes // EXPLAIN_RECIPES_PER_AUTHOR, 2))
+    )
+    ingredients = Ingredient.objects.bulk_create(
+        Ingredient(name=f'explain {number}', measurement_unit='г')
+        for number in range(EXPLAIN_INGREDIENTS)
+    )
+    tags = Tag.objects.bulk_create(
+        Tag(
+            name=f'explain{number}',
+            color=f'#ee{number:04x}',
+            slug=f'explain-{number}',
+        )
+        for number in range(EXPLAIN_TAGS)
+    )
+    created = Recipe.objects.bulk_create(
+        Recipe(
+            author=users[number % len(users)],
+            name=f'Explain {number}',
+            image='food/explain.png',
+            text='Explain',
+            cooking_time=10,
+        )
+        for number in range(recipes)
+    )
+    IngredientAmount.objects.bulk_create(
+        IngredientAmount(
+            recipe=recipe,
+            ingredient=ingredients[(number + shift) % len(ingredients)],
+            amount=1,
+        )
+        for number, recipe in enumerate(created) for shift in range(5)
+    )
+    RecipeTag.objects.bulk_create(
+        RecipeTag(recipe=recipe, tag=tags[number % len(tags)])
+        for number, recipe in enumerate(created)
+    )
+    user = users[0]
+    Follow.objects.bulk_create(
+        Follow(user=user, author=author)
+        for author in users[1:EXPLAIN_FOLLOWS + 1]
+    )
+    for model in (Favorite, Cart):
+        model.objects.bulk_create(
+            model(user=user, recipe=recipe) for recipe in created[::10]
+        )
+    return user
@@ -0,0 +1,97 @@
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, IntegerField, OuterRef, Prefetch, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from recipes.models import Cart, Favorite, IngredientAmount, Recipe
+
+from .constants import EXPORT_CHUNK_SIZE
+
+
+def _count_subquery(model):
+    """Подзапрос с количеством строк model для рецепта."""
+    counts = (
+        model.objects.filter(recipe=OuterRef('pk'))
+        .order_by()
+        .values('recipe')
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def parse_updated_since(value):
+    """Разбор параметра updated_since, None если он не передан."""
+    if not value:
+        return None
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise ValueError(f'Неверный формат даты: {value}')
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def get_export_queryset(updated_since=None):
+    """Рецепты для выгрузки со счётчиками и связанными данными."""
+    queryset = (
+        Recipe.objects
+        .annotate(
+            favorites_count=_count_subquery(Favorite),
+            shopping_cart_count=_count_subquery(Cart),
+        )
+        .prefetch_related(
+            Prefetch(
+                'ingredient_in_recipe',
+                queryset=IngredientAmount.objects.select_related('ingredient')
+            ),
+            'tags',
+        )
+        .order_by('updated_at', 'pk')
+    )
+    if updated_since is not None:
+        queryset = queryset.filter(updated_at__gt=updated_since)
+    return queryset
+
+
+def recipe_to_row(recipe):
+    """Строка выгрузки для одного рецепта."""
+    return {
+        'id': recipe.pk,
+        'name': recipe.name,
+        'author': recipe.author_id,
+        'text': recipe.text,
+        'cooking_time': recipe.cooking_time,
+        'image': recipe.image.name,
+        'pub_date': recipe.pub_date,
+        'updated_at': recipe.updated_at,
+        'tags': [tag.slug for tag in recipe.tags.all()],
+        'ingredients': [
+            {
+                'id': item.ingredient_id,
+                'name': item.ingredient.name,
+                'measurement_unit': item.ingredient.measurement_unit,
+                'amount': item.amount,
+            }
+            for item in recipe.ingredient_in_recipe.all()
+        ],
+        'favorites_count': recipe.favorites_count,
+        'shopping_cart_count': recipe.shopping_cart_count,
+    }
+
+
+def iter_recipes_ndjson(updated_since=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Построчная выгрузка рецептов в NDJSON.
+    Рецепты читаются пачками через iterator(), поэтому потребление
+    памяти не зависит от размера каталога.
+    """
+    queryset = get_export_queryset(updated_since)
+    for recipe in queryset.iterator(chunk_size=chunk_size):
+        yield json.dumps(
+            recipe_to_row(recipe),
+            cls=DjangoJSONEncoder,
+            ensure_ascii=False,
+        ) + '\n'
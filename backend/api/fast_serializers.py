@@ -0,0 +1,188 @@
+from functools import lru_cache
+
+from django.contrib.auth import get_user_model
+from django.db.models import Exists, OuterRef
+from recipes.models import Cart, Favorite, IngredientAmount, Recipe
+from users.models import Follow
+
+from .images import get_variant_urls
+from .serializers import RecipeReadSerializer
+
+User = get_user_model()
+
+RECIPE_COLUMNS = ('name', 'image', 'image_variants', 'text', 'cooking_time')
+USER_COLUMNS = ('email', 'id', 'username', 'first_name', 'last_name')
+RECIPE_FLAGS = {
+    'is_favorited': Favorite,
+    'is_in_shopping_cart': Cart,
+}
+
+
+def annotate_recipe_flags(queryset, user, fields):
+    """Флаги избранного и корзины одним запросом через Exists."""
+    if not user.is_authenticated:
+        return queryset
+    return queryset.annotate(**{
+        flag: Exists(model.objects.filter(user=user, recipe=OuterRef('pk')))
+        for flag, model in RECIPE_FLAGS.items() if flag in fields
+    })
+
+
+@lru_cache(maxsize=None)
+def compile_recipe_fields(fields):
+    """Порядок ключей ответа как у RecipeReadSerializer."""
+    return tuple(
+        name for name in RecipeReadSerializer.Meta.fields if name in fields
+    )
+
+
+class FastRecipeListSerializer:
+    """
+    Список рецептов из строк .values() без экземпляров моделей.
+    Результат совпадает с RecipeReadSerializer(many=True) байт в байт.
+    """
+
+    image_storage = Recipe._meta.get_field('image').storage
+    avatar_storage = User._meta.get_field('avatar').storage
+
+    def __init__(self, context, fields=RecipeReadSerializer.Meta.fields):
+        self.request = context.get('request')
+        self.fields = compile_recipe_fields(frozenset(fields))
+
+    @property
+    def user(self):
+        return getattr(self.request, 'user', None)
+
+    def get_queryset(self, queryset):
+        """Строки рецептов только с нужными колонками."""
+        columns = ['id', 'author_id']
+        columns.extend(name for name in RECIPE_COLUMNS if name in self.fields)
+        if self.user is not None:
+            queryset = annotate_recipe_flags(queryset, self.user, self.fields)
+            columns.extend(
+                flag for flag in RECIPE_FLAGS
+                if flag in self.fields and self.user.is_authenticated
+            )
+        return queryset.values(*columns)
+
+    def _subscribed_queryset(self, author_ids):
+        if self.user is None or not self.user.is_authenticated:
+            return None
+        return Follow.objects.filter(
+            user=self.user, author__in=author_ids
+        ).values_list('author_id', flat=True)
+
+    def _authors_queryset(self, author_ids):
+        return User.objects.filter(pk__in=author_ids).values(
+            *USER_COLUMNS, 'avatar'
+        )
+
+    def _build_author(self, author, subscribed):
+        avatar = author.pop('avatar')
+        author['is_subscribed'] = author['id'] in subscribed
+        author['avatar'] = (
+            self.avatar_storage.url(avatar) if avatar else None
+        )
+        return author
+
+    def get_authors(self, rows):
+        author_ids = {row['author_id'] for row in rows}
+        subscribed = self._subscribed_queryset(author_ids)
+        subscribed = set(subscribed) if subscribed is not None else set()
+        return {
+            author['id']: self._build_author(author, subscribed)
+            for author in self._authors_queryset(author_ids)
+        }
+
+    async def aget_authors(self, rows):
+        author_ids = {row['author_id'] for row in rows}
+        subscribed = self._subscribed_queryset(author_ids)
+        subscribed = (
+            {pk async for pk in subscribed} if subscribed is not None
+            else set()
+        )
+        return {
+            author['id']: self._build_author(author, subscribed)
+            async for author in self._authors_queryset(author_ids)
+        }
+
+    def _amounts_queryset(self, recipe_ids):
+        return IngredientAmount.objects.filter(
+            recipe__in=recipe_ids
+        ).values_list(
+            'recipe_id', 'ingredient_id', 'ingredient__name',
+            'ingredient__measurement_unit', 'amount'
+        )
+
+    @staticmethod
+    def _add_ingredient(ingredients, amount):
+        recipe_id, pk, name, unit, amount = amount
+        ingredients[recipe_id].append({
+            'id': pk,
+            'name': name,
+            'measurement_unit': unit,
+            'amount': amount,
+        })
+
+    def get_ingredients(self, rows):
+        ingredients = {row['id']: [] for row in rows}
+        for amount in self._amounts_queryset(list(ingredients)):
+            self._add_ingredient(ingredients, amount)
+        return ingredients
+
+    async def aget_ingredients(self, rows):
+        ingredients = {row['id']: [] for row in rows}
+        async for amount in self._amounts_queryset(list(ingredients)):
+            self._add_ingredient(ingredients, amount)
+        return ingredients
+
+    def get_image(self, name):
+        if not name:
+            return None
+        url = self.image_storage.url(name)
+        if self.request is not None:
+            return self.request.build_absolute_uri(url)
+        return url
+
+    def to_representation(self, rows):
+        rows = list(rows)
+        related = {}
+        if rows and 'author' in self.fields:
+            related['author'] = self.get_authors(rows)
+        if rows and 'ingredients' in self.fields:
+            related['ingredients'] = self.get_ingredients(rows)
+        return self.build(rows, related)
+
+    async def ato_representation(self, rows):
+        """Вариант to_representation для async-представлений."""
+        rows = [row async for row in rows] if hasattr(
+            rows, '__aiter__'
+        ) else list(rows)
+        related = {}
+        if rows and 'author' in self.fields:
+            related['author'] = await self.aget_authors(rows)
+        if rows and 'ingredients' in self.fields:
+            related['ingredients'] = await self.aget_ingredients(rows)
+        return self.build(rows, related)
+
+    def build(self, rows, related):
+        data = []
+        for row in rows:
+            item = {}
+            for name in self.fields:
+                if name == 'id':
+                    item[name] = row['id']
+                elif name == 'author':
+                    item[name] = dict(related['author'][row['author_id']])
+                elif name == 'ingredients':
+                    item[name] = related['ingredients'][row['id']]
+                elif name == 'image':
+                    item[name] = self.get_image(row['image'])
+                elif name == 'image_variants':
+                    item[name] = get_variant_urls(
+                        row['image_variants'], self.request
+                    )
+                else:
+                    item[name] = row.get(name, False)
+            data.append(item)
+        return data
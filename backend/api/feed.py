@@ -0,0 +1,195 @@
+from django.core.cache import cache
+from django.db.models import Count, Q
+from jobs.queue import enqueue
+from recipes.models import FeedEntry, Recipe
+from users.models import Follow
+
+from .constants import (FEED_BACKFILL_LIMIT, FEED_BATCH_SIZE,
+                        FEED_FANOUT_LIMIT, FEED_PULL_AUTHORS_TIMEOUT)
+
+PULL_AUTHORS_KEY = 'api:feed:pull_authors'
+# Множество прошлого расчёта хранится без срока: по нему видно, какие
+# авторы вернулись к рассылке.
+PREVIOUS_PULL_AUTHORS_KEY = 'api:feed:pull_authors:previous'
+
+
+def get_all_pull_authors():
+    """
+    Популярные авторы, ленты подписчиков которых собираются при чтении.
+    Группировка по всем подпискам кэшируется, и рассылка, и чтение
+    ленты решают по одному и тому же множеству. Рецепты автора, который
+    опустился ниже порога, пока читались при чтении и не разосланы,
+    поэтому при пересчёте для него ставится backfill_author_feed.
+    """
+    authors = cache.get(PULL_AUTHORS_KEY)
+    if authors is None:
+        authors = frozenset(
+            Follow.objects.order_by().values('author')
+            .annotate(followers=Count('pk'))
+            .filter(followers__gt=FEED_FANOUT_LIMIT)
+            .values_list('author', flat=True)
+        )
+        cache.set(PULL_AUTHORS_KEY, authors, FEED_PULL_AUTHORS_TIMEOUT)
+        previous = cache.get(PREVIOUS_PULL_AUTHORS_KEY, frozenset())
+        cache.set(PREVIOUS_PULL_AUTHORS_KEY, authors, None)
+        for author_id in previous - authors:
+            enqueue(backfill_author_feed, author_id)
+    return authors
+
+
+def is_pull_author(author_id):
+    return author_id in get_all_pull_authors()
+
+
+def get_pull_authors(user):
+    """Авторы из подписок пользователя, рецепты которых не рассылаются."""
+    authors = get_all_pull_authors()
+    if not authors:
+        return []
+    return list(
+        Follow.objects.filter(user=user, author__in=authors)
+        .values_list('author', flat=True)
+    )
+
+
+def fan_out_recipe(recipe_id, batch_size=FEED_BATCH_SIZE):
+    """Добавление нового рецепта в ленты подписчиков автора пачками."""
+    recipe = Recipe.objects.filter(pk=recipe_id).values(
+        'author', 'pub_date'
+    ).first()
+    if recipe is None or is_pull_author(recipe['author']):
+        return 0
+    author_id = recipe['author']
+    followers = (
+        Follow.objects.filter(author_id=author_id)
+        .values_list('user_id', flat=True)
+        .iterator(chunk_size=batch_size)
+    )
+    batch, total = [], 0
+    for user_id in followers:
+        batch.append(FeedEntry(
+            user_id=user_id, recipe_id=recipe_id, author_id=author_id,
+            pub_date=recipe['pub_date'],
+        ))
+        if len(batch) == batch_size:
+            FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+            total += len(batch)
+            batch = []
+    if batch:
+        FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+        total += len(batch)
+    return total
+
+
+def backfill_feed(user_id, author_id, limit=FEED_BACKFILL_LIMIT):
+    """Последние рецепты автора в ленте нового подписчика."""
+    if is_pull_author(author_id) or not Follow.objects.filter(
+        user_id=user_id, author_id=author_id
+    ).exists():
+        return
+    recipes = (
+        Recipe.objects.filter(author_id=author_id)
+        .values_list('pk', 'pub_date')[:limit]
+    )
+    FeedEntry.objects.bulk_create(
+        [
+            FeedEntry(
+                user_id=user_id, recipe_id=pk, author_id=author_id,
+                pub_date=pub_date,
+            )
+            for pk, pub_date in recipes
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def backfill_author_feed(author_id, limit=FEED_BACKFILL_LIMIT,
+                         batch_size=FEED_BATCH_SIZE):
+    """
+    Последние рецепты автора, вернувшегося к рассылке, в лентах всех
+    его подписчиков.
+    """
+    if is_pull_author(author_id):
+        return 0
+    recipes = list(
+        Recipe.objects.filter(author_id=author_id)
+        .values_list('pk', 'pub_date')[:limit]
+    )
+    if not recipes:
+        return 0
+    followers = (
+        Follow.objects.filter(author_id=author_id)
+        .values_list('user_id', flat=True)
+        .iterator(chunk_size=batch_size)
+    )
+    batch, total = [], 0
+    for user_id in followers:
+        batch.extend(
+            FeedEntry(
+                user_id=user_id, recipe_id=pk, author_id=author_id,
+                pub_date=pub_date,
+            )
+            for pk, pub_date in recipes
+        )
+        if len(batch) >= batch_size:
+            FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+            total += len(batch)
+            batch = []
+    if batch:
+        FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+        total += len(batch)
+    return total
+
+
+def prune_feed(user_id, author_id):
+    """Удаление рецептов автора из ленты отписавшегося пользователя."""
+    if Follow.objects.filter(user_id=user_id, author_id=author_id).exists():
+        return
+    FeedEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def _before(queryset, pk_field, cursor):
+    if cursor is None:
+        return queryset
+    moment, pk = cursor
+    return queryset.filter(
+        Q(pub_date__lt=moment) | Q(pub_date=moment, **{f'{pk_field}__lt': pk})
+    )
+
+
+class FeedTimeline:
+    """
+    Id рецептов ленты по убыванию (pub_date, id) страницами по курсору.
+    Разосланные рецепты читаются из FeedEntry по индексу
+    (user, -pub_date), рецепты популярных авторов по индексу
+    (author, -pub_date) рецептов. Каждый источник отдаёт не больше
+    limit строк после курсора, поэтому глубина страницы не влияет на
+    её стоимость.
+    """
+
+    def __init__(self, user):
+        pull_authors = get_pull_authors(user)
+        self.entries = (
+            FeedEntry.objects.filter(
+                user=user, recipe__deleted_at__isnull=True
+            )
+            .exclude(author__in=pull_authors)
+            .order_by('-pub_date', '-recipe_id')
+            .values_list('pub_date', 'recipe_id')
+        )
+        self.pulled = (
+            Recipe.objects.filter(author__in=pull_authors)
+            .order_by('-pub_date', '-pk')
+            .values_list('pub_date', 'pk')
+        ) if pull_authors else None
+
+    def page(self, cursor, limit):
+        """
+        Строки (pub_date, id) страницы после cursor и признак того, что
+        за ними есть ещё.
+        """
+        rows = list(_before(self.entries, 'recipe_id', cursor)[:limit + 1])
+        if self.pulled is not None:
+            rows.extend(_before(self.pulled, 'pk', cursor)[:limit + 1])
+            rows.sort(reverse=True)
+        return rows[:limit], len(rows) > limit
@@ -1,20 +1,36 @@
 from django.contrib.auth import get_user_model
+from django.db.models import Count, Exists, OuterRef, Q
 from django_filters.rest_framework import FilterSet, filters
-from recipes.models import Recipe, Tag
+from recipes.models import Recipe, RecipeTag, Tag
 
 User = get_user_model()
 
+TAGS_MODE_ANY = 'any'
+TAGS_MODE_ALL = 'all'
+TAGS_MODES = (
+    (TAGS_MODE_ANY, 'Любой из тегов'),
+    (TAGS_MODE_ALL, 'Все теги'),
+)
+
 
 class RecipeFilter(FilterSet):
     """
     Фильтр по выбранному автору, комбинации тегов,
     в избранном, в корзине.
+    Теги проверяются подзапросами Exists к таблице связей, поэтому
+    рецепты не дублируются и DISTINCT не нужен. tags_mode=any
+    оставляет рецепты хотя бы с одним тегом, tags_mode=all со всеми.
     """
     author = filters.ModelChoiceFilter(queryset=User.objects.all())
     tags = filters.ModelMultipleChoiceFilter(
         field_name='tags__slug',
         queryset=Tag.objects.all(),
         to_field_name='slug',
+        method='get_tags',
+    )
+    tags_mode = filters.ChoiceFilter(
+        choices=TAGS_MODES,
+        method='get_tags_mode',
     )
     is_favorited = filters.BooleanFilter(method='get_is_favorited')
     is_in_shopping_cart = filters.BooleanFilter(
@@ -23,7 +39,23 @@ class RecipeFilter(FilterSet):
 
     class Meta:
         model = Recipe
-        fields = ('tags', 'author', 'is_favorited', 'is_in_shopping_cart')
+        fields = ('tags', 'tags_mode', 'author', 'is_favorited',
+                  'is_in_shopping_cart')
+
+    def get_tags(self, queryset, name, value):
+        # Пустой выбор приходит пустым QuerySet, а не пустым значением,
+        # поэтому django-filter не пропускает фильтр сам.
+        if not value:
+            return queryset
+        links = RecipeTag.objects.filter(recipe=OuterRef('pk'))
+        if self.form.cleaned_data.get('tags_mode') != TAGS_MODE_ALL:
+            return queryset.filter(Exists(links.filter(tag__in=value)))
+        for tag in value:
+            queryset = queryset.filter(Exists(links.filter(tag=tag)))
+        return queryset
+
+    def get_tags_mode(self, queryset, name, value):
+        return queryset
 
     def get_is_favorited(self, queryset, name, value):
         if not self.request.user.is_authenticated:
@@ -38,3 +70,21 @@ class RecipeFilter(FilterSet):
         if value:
             return queryset.filter(carts__user=self.request.user)
         return queryset.exclude(carts__user=self.request.user)
+
+
+def get_tag_facets(request, queryset):
+    """
+    Количество рецептов по каждому тегу с учётом остальных фильтров.
+    Параметр tags не учитывается, чтобы счётчики показывали, сколько
+    рецептов появится при выборе тега. Все счётчики считаются одним
+    сгруппированным запросом по индексу (tag, recipe).
+    """
+    data = request.query_params.copy()
+    data.pop('tags', None)
+    recipes = RecipeFilter(data, queryset=queryset, request=request).qs
+    return list(
+        Tag.objects.annotate(count=Count(
+            'recipe_links',
+            filter=Q(recipe_links__recipe__in=recipes.order_by().values('pk'))
+        )).order_by('name').values('id', 'name', 'color', 'slug', 'count')
+    )
@@ -0,0 +1,93 @@
+import hashlib
+import io
+import logging
+import os
+
+from django.core.files.base import ContentFile
+from django.db.models import F
+from django.utils import timezone
+from PIL import Image, ImageOps
+from recipes.models import Recipe
+
+from .cache import RECIPES_NAMESPACE, bump_namespace
+from .constants import IMAGE_VARIANTS, IMAGE_VARIANTS_DIR, IMAGE_WEBP_QUALITY
+
+logger = logging.getLogger(__name__)
+
+image_storage = Recipe._meta.get_field('image').storage
+
+
+def render_variant(image, size):
+    """WebP копия, вписанная в квадрат size без увеличения."""
+    variant = image.copy()
+    variant.thumbnail((size, size), Image.LANCZOS)
+    buffer = io.BytesIO()
+    variant.save(buffer, 'WEBP', quality=IMAGE_WEBP_QUALITY, method=4)
+    return buffer.getvalue()
+
+
+def save_variant(name, content):
+    """
+    Сохранение копии под именем из хэша содержимого.
+    Одинаковое содержимое даёт то же имя, поэтому файл можно отдавать
+    с бессрочным кэшированием, а повторная обработка ничего не пишет.
+    """
+    digest = hashlib.sha256(content).hexdigest()[:20]
+    path = f'{IMAGE_VARIANTS_DIR}{name}-{digest}.webp'
+    if not image_storage.exists(path):
+        image_storage.save(path, ContentFile(content))
+    else:
+        # Свежее время изменения защищает переиспользованный файл от
+        # удаления gc_media, который мог не увидеть новую ссылку.
+        try:
+            os.utime(image_storage.path(path))
+        except (NotImplementedError, OSError):
+            pass
+    return path
+
+
+def make_image_variants(source):
+    with image_storage.open(source) as file:
+        image = ImageOps.exif_transpose(Image.open(file))
+        image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+    return {
+        name: save_variant(name, render_variant(image, size))
+        for name, size in IMAGE_VARIANTS.items()
+    }
+
+
+def generate_image_variants(recipe_id):
+    """
+    Копии картинки рецепта для фонового обработчика.
+    Если пока шла обработка картинку заменили, результат отбрасывается:
+    копии для новой картинки построит следующий запуск.
+    """
+    source = (
+        Recipe.objects.filter(pk=recipe_id)
+        .values_list('image', flat=True)
+        .first()
+    )
+    if not source:
+        return
+    try:
+        variants = make_image_variants(source)
+    except (OSError, Image.DecompressionBombError):
+        logger.warning('Не удалось обработать картинку %s', source)
+        return
+    updated = Recipe.objects.filter(pk=recipe_id, image=source).update(
+        image_variants=variants,
+        updated_at=timezone.now(),
+        version=F('version') + 1,
+    )
+    if updated:
+        from .snapshots import rebuild_snapshots
+        rebuild_snapshots(Recipe.objects.filter(pk=recipe_id))
+        bump_namespace(RECIPES_NAMESPACE)
+
+
+def get_variant_urls(variants, request=None):
+    urls = {}
+    for name, path in variants.items():
+        url = image_storage.url(path)
+        urls[name] = request.build_absolute_uri(url) if request else url
+    return urls
@@ -0,0 +1,235 @@
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.files.storage import default_storage
+from django.db import DatabaseError, transaction
+from jobs.queue import enqueue
+from recipes.models import Ingredient, IngredientAmount, Recipe, Tag
+from rest_framework.exceptions import ValidationError
+
+from .cache import RECIPES_NAMESPACE, bump_namespace
+from .events import RECIPE_CREATED, notify_followers
+from .feed import fan_out_recipe
+from .images import generate_image_variants
+from .uploads import decode_base64_image
+from .constants import (IMPORT_CHUNK_SIZE, IMPORT_WORKERS, MAX_COOKING_TIME,
+                        MAX_INGREDIENT_AMOUNT, MIN_COOKING_TIME,
+                        MIN_INGREDIENT_AMOUNT)
+
+User = get_user_model()
+
+
+def _is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _is_int_in_range(value, min_value, max_value):
+    return _is_int(value) and min_value <= value <= max_value
+
+
+def save_image(data):
+    """Декодирование base64 картинки и запись в хранилище."""
+    image = decode_base64_image(data)
+    name = Recipe._meta.get_field('image').generate_filename(None, image.name)
+    return default_storage.save(name, image)
+
+
+class RecipeImporter:
+    """
+    Пакетный импорт рецептов.
+    Ингредиенты и теги проверяются по заранее загруженным множествам,
+    картинки пишутся в хранилище пулом потоков, рецепты и связи
+    создаются через bulk_create пачками. Ошибки собираются по строкам
+    и не прерывают импорт остальных рецептов. bulk_create не вызывает
+    post_save, поэтому лента подписчиков и уведомления запускаются
+    импортом явно.
+    """
+
+    def __init__(self, author=None, chunk_size=IMPORT_CHUNK_SIZE,
+                 workers=IMPORT_WORKERS):
+        self.author = author
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.ingredient_ids = set(
+            Ingredient.objects.values_list('id', flat=True)
+        )
+        self.tag_ids = set(Tag.objects.values_list('id', flat=True))
+        self.created = []
+        self.errors = []
+
+    def run(self, rows):
+        """Импорт строк, rows может быть генератором."""
+        rows = enumerate(rows, start=1)
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            while True:
+                chunk = list(islice(rows, self.chunk_size))
+                if not chunk:
+                    break
+                self.import_chunk(chunk, pool)
+        self.errors.sort(key=lambda error: error['row'])
+        return {'created': self.created, 'errors': self.errors}
+
+    def add_error(self, number, errors):
+        self.errors.append({'row': number, 'errors': errors})
+
+    def get_author_id(self, row):
+        author = row.get('author')
+        if author is None and self.author is not None:
+            return self.author.pk
+        return author
+
+    def validate(self, row, author_ids, taken):
+        """Проверка строки без обращений к базе."""
+        if not isinstance(row, dict):
+            return {'non_field_errors': 'Ожидается объект рецепта.'}
+        errors = {}
+        author_id = self.get_author_id(row)
+        if not _is_int(author_id) or author_id not in author_ids:
+            errors['author'] = 'Автор не найден.'
+        name = row.get('name')
+        if not isinstance(name, str) or not 0 < len(name) <= 256:
+            errors['name'] = 'Название должно быть от 1 до 256 символов.'
+        elif 'author' not in errors and (author_id, name) in taken:
+            errors['name'] = 'У автора уже есть рецепт с таким названием.'
+        text = row.get('text')
+        if not isinstance(text, str) or not 0 < len(text) <= 3000:
+            errors['text'] = 'Описание должно быть от 1 до 3000 символов.'
+        if not _is_int_in_range(row.get('cooking_time'),
+                                MIN_COOKING_TIME, MAX_COOKING_TIME):
+            errors['cooking_time'] = (
+                f'Время приготовления от {MIN_COOKING_TIME} '
+                f'до {MAX_COOKING_TIME}.'
+            )
+        if not row.get('image'):
+            errors['image'] = 'Image не может быть пустым.'
+        ingredient_errors = self.validate_ingredients(row.get('ingredients'))
+        if ingredient_errors:
+            errors['ingredients'] = ingredient_errors
+        tags = row.get('tags', [])
+        if not isinstance(tags, list) or any(
+            not _is_int(tag) or tag not in self.tag_ids for tag in tags
+        ):
+            errors['tags'] = 'Тег(и) не существуют.'
+        return errors
+
+    def validate_ingredients(self, ingredients):
+        if not isinstance(ingredients, list) or not ingredients:
+            return 'Добавьте хотя бы один ингредиент.'
+        ids = []
+        for item in ingredients:
+            if not isinstance(item, dict) or not _is_int(item.get('id')):
+                return 'Укажите id ингредиента.'
+            if not _is_int_in_range(
+                item.get('amount'),
+                MIN_INGREDIENT_AMOUNT, MAX_INGREDIENT_AMOUNT
+            ):
+                return (
+                    f'Количество ингредиента от {MIN_INGREDIENT_AMOUNT} '
+                    f'до {MAX_INGREDIENT_AMOUNT}.'
+                )
+            ids.append(item.get('id'))
+        if len(ids) != len(set(ids)):
+            return 'Ингредиенты не должны повторяться.'
+        invalid_ids = [pk for pk in ids if pk not in self.ingredient_ids]
+        if invalid_ids:
+            return f'Ингредиент(ы) с id {invalid_ids} не существует.'
+        return None
+
+    def import_chunk(self, chunk, pool):
+        rows = [row for _, row in chunk if isinstance(row, dict)]
+        author_ids = set(
+            User.objects.filter(pk__in={
+                author_id for author_id in map(self.get_author_id, rows)
+                if _is_int(author_id)
+            }).values_list('pk', flat=True)
+        )
+        names = {
+            row['name'] for row in rows if isinstance(row.get('name'), str)
+        }
+        taken = set(
+            Recipe.objects.filter(author__in=author_ids, name__in=names)
+            .values_list('author_id', 'name')
+        )
+        valid = []
+        for number, row in chunk:
+            errors = self.validate(row, author_ids, taken)
+            if errors:
+                self.add_error(number, errors)
+                continue
+            taken.add((self.get_author_id(row), row['name']))
+            valid.append((number, row))
+
+        images = pool.map(self.save_image_safe, [row for _, row in valid])
+        recipes = []
+        for (number, row), (image, error) in zip(valid, images):
+            if error is not None:
+                self.add_error(number, {'image': error})
+                continue
+            recipes.append((number, row, Recipe(
+                author_id=self.get_author_id(row),
+                name=row['name'],
+                text=row['text'],
+                cooking_time=row['cooking_time'],
+                image=image,
+            )))
+        if recipes:
+            self.save_recipes(recipes)
+
+    def save_image_safe(self, row):
+        try:
+            return save_image(row['image']), None
+        except ValidationError as error:
+            return None, error.detail
+        except DjangoValidationError as error:
+            return None, error.messages
+
+    def insert(self, recipes):
+        Recipe.objects.bulk_create([recipe for _, _, recipe in recipes])
+        IngredientAmount.objects.bulk_create(
+            IngredientAmount(
+                recipe=recipe,
+                ingredient_id=item['id'],
+                amount=item['amount'],
+            )
+            for _, row, recipe in recipes
+            for item in row['ingredients']
+        )
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe=recipe, tag_id=tag_id)
+            for _, row, recipe in recipes
+            for tag_id in row.get('tags', [])
+        )
+
+    def save_recipes(self, recipes):
+        try:
+            with transaction.atomic():
+                self.insert(recipes)
+        except DatabaseError:
+            # Откатилась вся пачка: строки сохраняются по одной, чтобы
+            # ошибка одной строки не отменяла остальные.
+            recipes = [item for item in recipes if self.save_recipe(item)]
+        if recipes:
+            self.recipes_saved(recipes)
+
+    def save_recipe(self, item):
+        number, _, recipe = item
+        recipe.pk = None
+        recipe._state.adding = True
+        try:
+            with transaction.atomic():
+                self.insert([item])
+        except DatabaseError as error:
+            default_storage.delete(recipe.image.name)
+            self.add_error(number, {'non_field_errors': str(error)})
+            return False
+        return True
+
+    def recipes_saved(self, recipes):
+        self.created.extend(recipe.pk for _, _, recipe in recipes)
+        bump_namespace(RECIPES_NAMESPACE)
+        for _, _, recipe in recipes:
+            enqueue(fan_out_recipe, recipe.pk)
+            enqueue(generate_image_variants, recipe.pk)
+            notify_followers(recipe, RECIPE_CREATED)
@@ -0,0 +1,248 @@
+import asyncio
+import io
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError
+from urllib.parse import quote, urlsplit
+from urllib.request import Request, urlopen
+
+from django.core.asgi import get_asgi_application
+from django.core.wsgi import get_wsgi_application
+from django.core.management.base import BaseCommand, CommandError
+from recipes.models import Recipe
+from rest_framework.authtoken.models import Token
+
+ENDPOINTS = (
+    'tags/',
+    'ingredients/?name=а',
+    'recipes/',
+    'recipes/{recipe}/',
+    'users/subscriptions/',
+)
+AUTH_ONLY_ENDPOINTS = frozenset(('users/subscriptions/',))
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнение синхронных и async-версий читающих эндпоинтов так, '
+        'как они развёрнуты: /api/ под WSGI, /api/async/ под ASGI. '
+        'Пропускная способность и задержка при разном числе '
+        'одновременных запросов, в процессе или по HTTP через nginx.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', help='Email пользователя, по умолчанию аноним.'
+        )
+        parser.add_argument(
+            '--concurrency', type=int, nargs='+', default=[1, 10, 50],
+            help='Числа одновременных запросов.'
+        )
+        parser.add_argument(
+            '--requests', type=int, default=200,
+            help='Количество запросов на каждый замер.'
+        )
+        parser.add_argument(
+            '--host', default='localhost',
+            help='Заголовок Host, должен входить в ALLOWED_HOSTS.'
+        )
+        parser.add_argument(
+            '--wsgi-workers', type=int, default=1,
+            help=(
+                'Сколько запросов WSGI обрабатывается одновременно в '
+                'процессе, как у синхронных воркеров gunicorn.'
+            )
+        )
+        parser.add_argument(
+            '--base-url',
+            help=(
+                'Адрес развёрнутого сервиса, например '
+                'http://localhost:4000: запросы идут по HTTP через '
+                'nginx, который отправляет /api/async/ в ASGI-сервис.'
+            )
+        )
+
+    def get_headers(self, options):
+        headers = {'host': options['host']}
+        if not options['user']:
+            return headers
+        token = Token.objects.filter(user__email=options['user']).first()
+        if token is None:
+            raise CommandError(
+                f'У пользователя {options["user"]} нет токена.'
+            )
+        headers['authorization'] = f'Token {token.key}'
+        return headers
+
+    def get_endpoints(self, options):
+        recipe = Recipe.objects.values_list('pk', flat=True).first()
+        if recipe is None:
+            raise CommandError('Нет рецептов для замера.')
+        return [
+            quote(endpoint.format(recipe=recipe), safe='/?=&')
+            for endpoint in ENDPOINTS
+            if options['user'] or endpoint not in AUTH_ONLY_ENDPOINTS
+        ]
+
+    async def call(self, mode, path, headers):
+        loop = asyncio.get_running_loop()
+        if self.base_url is not None:
+            return await loop.run_in_executor(
+                self.http_pool, self.call_http, path, headers
+            )
+        if mode == 'sync':
+            return await loop.run_in_executor(
+                self.wsgi_pool, self.call_wsgi, path, headers
+            )
+        return await self.call_asgi(path, headers)
+
+    def call_http(self, path, headers):
+        request = Request(f'{self.base_url}{path}', headers={
+            name: value for name, value in headers.items() if name != 'host'
+        })
+        try:
+            with urlopen(request) as response:
+                return response.read()
+        except HTTPError as error:
+            raise CommandError(f'{path}: ответ {error.code}.')
+
+    def call_wsgi(self, path, headers):
+        url = urlsplit(path)
+        environ = {
+            'REQUEST_METHOD': 'GET',
+            'SCRIPT_NAME': '',
+            'PATH_INFO': url.path,
+            'QUERY_STRING': url.query,
+            'SERVER_NAME': 'localhost',
+            'SERVER_PORT': '80',
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'REMOTE_ADDR': '127.0.0.1',
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': 'http',
+            'wsgi.input': io.BytesIO(),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+            **{
+                f'HTTP_{name.upper()}': value
+                for name, value in headers.items()
+            },
+        }
+        statuses = []
+        result = self.wsgi_app(
+            environ, lambda status, *args: statuses.append(status)
+        )
+        try:
+            body = b''.join(result)
+        finally:
+            result.close()
+        if not statuses[0].startswith('200'):
+            raise CommandError(f'{path}: ответ {statuses[0]}.')
+        return body
+
+    async def call_asgi(self, path, headers):
+        url = urlsplit(path)
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': url.path,
+            'raw_path': url.path.encode(),
+            'query_string': url.query.encode(),
+            'headers': [
+                (name.encode(), value.encode())
+                for name, value in headers.items()
+            ],
+            'server': ('localhost', 80),
+            'client': ('127.0.0.1', 0),
+        }
+        received = False
+
+        async def receive():
+            nonlocal received
+            if received:
+                await asyncio.Future()
+            received = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        status, body = None, []
+
+        async def send(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            elif message['type'] == 'http.response.body':
+                body.append(message.get('body', b''))
+
+        await self.asgi_app(scope, receive, send)
+        if status != 200:
+            raise CommandError(f'{path}: ответ {status}.')
+        return b''.join(body)
+
+    async def measure(self, mode, path, headers, concurrency, total):
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies = []
+
+        async def timed():
+            async with semaphore:
+                started = time.perf_counter()
+                await self.call(mode, path, headers)
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(timed() for _ in range(total)))
+        elapsed = time.perf_counter() - started
+        latencies.sort()
+        return (
+            total / elapsed,
+            statistics.median(latencies) * 1000,
+            latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        )
+
+    async def run(self, endpoints, headers, options):
+        for endpoint in endpoints:
+            paths = {
+                'sync': f'/api/{endpoint}',
+                'async': f'/api/async/{endpoint}',
+            }
+            bodies = {
+                mode: await self.call(mode, path, headers)
+                for mode, path in paths.items()
+            }
+            if bodies['sync'] != bodies['async'].replace(
+                b'/api/async/', b'/api/'
+            ):
+                raise CommandError(f'{endpoint}: ответы не совпадают.')
+            for concurrency in options['concurrency']:
+                line = []
+                for mode, path in paths.items():
+                    rps, median, p95 = await self.measure(
+                        mode, path, headers, concurrency,
+                        options['requests']
+                    )
+                    line.append(
+                        f'{mode} {rps:.0f} запр/с, '
+                        f'медиана {median:.1f} мс, p95 {p95:.1f} мс'
+                    )
+                self.stdout.write(
+                    f'{endpoint} x{concurrency}: ' + ' | '.join(line)
+                )
+
+    def handle(self, *args, **options):
+        endpoints = self.get_endpoints(options)
+        headers = self.get_headers(options)
+        self.base_url = options['base_url']
+        if self.base_url is not None:
+            self.base_url = self.base_url.rstrip('/')
+        self.asgi_app = get_asgi_application()
+        self.wsgi_app = get_wsgi_application()
+        with ThreadPoolExecutor(options['wsgi_workers']) as wsgi_pool, \
+                ThreadPoolExecutor(max(options['concurrency'])) as http_pool:
+            self.wsgi_pool, self.http_pool = wsgi_pool, http_pool
+            asyncio.run(self.run(endpoints, headers, options))
+        self.stdout.write(self.style.SUCCESS('Ответы совпадают.'))
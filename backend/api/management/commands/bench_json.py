@@ -0,0 +1,105 @@
+import json
+import timeit
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from api.renderers import FastJSONRenderer, orjson
+
+RECIPE_TEXT = (
+    'Муку просеять, добавить яйца и молоко, замесить тесто. '
+    'Оставить на 30 минут, затем раскатать и выпекать до готовности. '
+) * 8
+
+
+def make_recipe(pk, ingredients_count):
+    """Рецепт в том виде, в котором его отдаёт RecipeReadSerializer."""
+    return {
+        'id': pk,
+        'author': {
+            'email': f'author{pk % 10}@example.ru',
+            'id': pk % 10,
+            'username': f'автор_{pk % 10}',
+            'first_name': 'Екатерина',
+            'last_name': 'Панфилова',
+            'is_subscribed': bool(pk % 2),
+            'avatar': f'/media/avatars/{pk % 10}.jpg',
+        },
+        'ingredients': [
+            {
+                'id': pk * 100 + number,
+                'name': f'Пшеничная мука высшего сорта №{number}',
+                'measurement_unit': 'г',
+                'amount': 100 + number,
+            }
+            for number in range(ingredients_count)
+        ],
+        'is_favorited': bool(pk % 3),
+        'is_in_shopping_cart': False,
+        'name': f'Блины на молоке {pk}',
+        'image': f'http://localhost/media/food/{pk}.jpg',
+        'text': RECIPE_TEXT,
+        'cooking_time': 45,
+    }
+
+
+def make_page(page_size, ingredients_count):
+    return {
+        'count': 1000,
+        'next': 'http://localhost/api/recipes/?page=3',
+        'previous': 'http://localhost/api/recipes/?page=1',
+        'results': [
+            make_recipe(pk, ingredients_count)
+            for pk in range(1, page_size + 1)
+        ],
+    }
+
+
+class Command(BaseCommand):
+    help = 'Сравнение скорости JSONRenderer и FastJSONRenderer.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--page-sizes', default='4,20,100',
+            help='Размеры страниц через запятую.'
+        )
+        parser.add_argument(
+            '--ingredients', type=int, default=10,
+            help='Количество ингредиентов в рецепте.'
+        )
+        parser.add_argument(
+            '--number', type=int, default=500,
+            help='Количество повторов кодирования.'
+        )
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            self.stdout.write(self.style.WARNING(
+                'orjson не установлен, FastJSONRenderer использует json.'
+            ))
+        renderers = {
+            'json': JSONRenderer(),
+            'fast': FastJSONRenderer(),
+        }
+        for page_size in map(int, options['page_sizes'].split(',')):
+            page = make_page(page_size, options['ingredients'])
+            rendered = {
+                name: renderer.render(page)
+                for name, renderer in renderers.items()
+            }
+            if json.loads(rendered['json']) != json.loads(rendered['fast']):
+                raise CommandError('Рендереры вернули разные данные.')
+            timings = {
+                name: timeit.timeit(
+                    lambda renderer=renderer: renderer.render(page),
+                    number=options['number'],
+                ) / options['number'] * 10 ** 6
+                for name, renderer in renderers.items()
+            }
+            self.stdout.write(
+                f'Страница из {page_size} рецептов '
+                f'({len(rendered["json"])} байт): '
+                f'json {timings["json"]:.1f} мкс, '
+                f'fast {timings["fast"]:.1f} мкс, '
+                f'ускорение x{timings["json"] / timings["fast"]:.1f}'
+            )
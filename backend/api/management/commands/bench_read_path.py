@@ -0,0 +1,97 @@
+import timeit
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from recipes.models import Recipe
+from rest_framework.request import Request
+
+from api.fast_serializers import FastRecipeListSerializer
+from api.renderers import FastJSONRenderer
+from api.serializers import RecipeReadSerializer, get_requested_fields
+from api.views import RecipeViewSet
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Проверка совпадения и сравнение скорости RecipeReadSerializer '
+        'и FastRecipeListSerializer на текущих данных.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', help='Email пользователя, по умолчанию аноним.'
+        )
+        parser.add_argument(
+            '--query', default='',
+            help='Параметры запроса списка, например "tags=breakfast".'
+        )
+        parser.add_argument(
+            '--page-size', type=int, default=20,
+            help='Количество рецептов на странице.'
+        )
+        parser.add_argument(
+            '--number', type=int, default=50,
+            help='Количество повторов.'
+        )
+
+    def get_view(self, options):
+        request = Request(
+            RequestFactory().get(f'/api/recipes/?{options["query"]}')
+        )
+        request.user = AnonymousUser()
+        if options['user']:
+            request.user = User.objects.filter(email=options['user']).first()
+            if request.user is None:
+                raise CommandError(
+                    f'Пользователь {options["user"]} не найден.'
+                )
+        return RecipeViewSet(
+            action='list', request=request, format_kwarg=None
+        )
+
+    def handle(self, *args, **options):
+        view = self.get_view(options)
+        request = view.request
+        page_size = options['page_size']
+        context = view.get_serializer_context()
+        fields = get_requested_fields(
+            request, RecipeReadSerializer.Meta.fields
+        )
+
+        def serializer_path():
+            queryset = view.filter_queryset(view.get_queryset())[:page_size]
+            return RecipeReadSerializer(
+                queryset, many=True, context=context
+            ).data
+
+        def fast_path():
+            serializer = FastRecipeListSerializer(context, fields)
+            queryset = serializer.get_queryset(
+                view.filter_queryset(Recipe.objects.all())
+            )[:page_size]
+            return serializer.to_representation(queryset)
+
+        renderer = FastJSONRenderer()
+        results = {}
+        for name, path in (('serializer', serializer_path),
+                           ('fast', fast_path)):
+            with CaptureQueriesContext(connection) as queries:
+                rendered = renderer.render(path())
+            seconds = timeit.timeit(path, number=options['number'])
+            results[name] = (rendered, len(queries), seconds)
+            self.stdout.write(
+                f'{name}: {len(queries)} запросов, '
+                f'{seconds / options["number"] * 1000:.2f} мс на страницу'
+            )
+        if results['serializer'][0] != results['fast'][0]:
+            raise CommandError('Ответы сериализаторов не совпадают.')
+        self.stdout.write(self.style.SUCCESS(
+            f'Ответы совпадают ({len(results["fast"][0])} байт), ускорение '
+            f'x{results["serializer"][2] / results["fast"][2]:.1f}'
+        ))
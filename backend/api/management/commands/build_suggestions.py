@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from api.constants import SUGGESTIONS_LIMIT
+from api.suggestions import get_author_ids, refresh_similar_authors
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчёт таблицы похожих авторов по общим подписчикам и общему '
+        'избранному.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit', type=int, default=SUGGESTIONS_LIMIT,
+            help='Количество похожих авторов на автора.'
+        )
+
+    def handle(self, *args, **options):
+        authors = total = 0
+        for author_id in get_author_ids():
+            total += refresh_similar_authors(author_id, options['limit'])
+            authors += 1
+            if authors % 1000 == 0:
+                self.stdout.write(f'Обработано авторов: {authors}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Авторов: {authors}, похожих: {total}.'
+        ))
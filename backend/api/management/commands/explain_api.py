@@ -0,0 +1,150 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import override_settings
+from recipes.models import (Cart, Favorite, Ingredient, IngredientAmount,
+                            Recipe, RecipeTag, Tag)
+from rest_framework.authtoken.models import Token
+from users.models import Follow
+
+from api.constants import EXPLAIN_MIN_ROWS
+from api.explain import (PlanAnalyzer, StatementCollector, get_endpoint_paths,
+                         make_index, seed_dataset, suggest_index,
+                         write_index_migrations)
+
+User = get_user_model()
+
+DUMMY_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+}
+SEEDED_MODELS = (
+    User, Ingredient, Tag, Recipe, IngredientAmount, RecipeTag, Follow,
+    Favorite, Cart,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'EXPLAIN запросов канонических эндпоинтов API: полные просмотры, '
+        'сортировки и вложенные циклы по большим таблицам и '
+        'предлагаемые индексы. Все запросы выполняются в транзакции, '
+        'которая откатывается.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            help=(
+                'Email пользователя для эндпоинтов с авторизацией, '
+                'по умолчанию они пропускаются.'
+            )
+        )
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help=(
+                'Добавить столько синтетических рецептов перед замером. '
+                'С --seed без --user запросы идут от пользователя '
+                'синтетических данных.'
+            )
+        )
+        parser.add_argument(
+            '--min-rows', type=int, default=EXPLAIN_MIN_ROWS,
+            help='С какого числа строк таблица считается большой.'
+        )
+        parser.add_argument(
+            '--write-migration', action='store_true',
+            help='Записать миграции с предложенными индексами.'
+        )
+
+    def get_user(self, options):
+        user = User.objects.filter(email=options['user']).first()
+        if user is None:
+            raise CommandError(f'Пользователь {options["user"]} не найден.')
+        return user
+
+    def handle(self, *args, **options):
+        if connection.vendor not in PlanAnalyzer.vendors:
+            raise CommandError(
+                f'EXPLAIN для {connection.vendor} не поддерживается.'
+            )
+        suggestions = {}
+        with override_settings(
+            CACHES=DUMMY_CACHES, ALLOWED_HOSTS=['testserver']
+        ), transaction.atomic():
+            user = None
+            if options['seed']:
+                user = seed_dataset(options['seed'])
+                self.analyze_tables()
+            if options['user']:
+                user = self.get_user(options)
+            self.explain_endpoints(user, options, suggestions)
+            transaction.set_rollback(True)
+        self.report(suggestions, options)
+
+    def analyze_tables(self):
+        """Статистика планировщика PostgreSQL по добавленным данным."""
+        if connection.vendor != 'postgresql':
+            return
+        with connection.cursor() as cursor:
+            for model in SEEDED_MODELS:
+                table = connection.ops.quote_name(model._meta.db_table)
+                cursor.execute(f'ANALYZE {table}')
+
+    def explain_endpoints(self, user, options, suggestions):
+        client = Client()
+        headers = {}
+        if user is not None:
+            token, _ = Token.objects.get_or_create(user=user)
+            headers['HTTP_AUTHORIZATION'] = f'Token {token.key}'
+        paths = get_endpoint_paths(user is not None)
+        if not paths:
+            raise CommandError('Нет рецептов, тегов или ингредиентов.')
+        analyzer = PlanAnalyzer(options['min_rows'])
+        for path in paths:
+            collector = StatementCollector()
+            with connection.execute_wrapper(collector):
+                response = client.get(path, **headers)
+            if response.status_code != 200:
+                raise CommandError(f'{path}: ответ {response.status_code}.')
+            self.stdout.write(
+                f'GET {path}: {len(collector.statements)} SELECT'
+            )
+            for sql, params in collector.statements.items():
+                plan, issues = analyzer.explain(sql, params)
+                if options['verbosity'] > 1:
+                    self.stdout.write(f'  {sql}\n{plan}')
+                for issue in issues:
+                    self.stdout.write(self.style.WARNING(
+                        f'  ! {issue.detail}'
+                    ))
+                    self.stdout.write(f'    {sql[:300]}')
+                    suggestion = suggest_index(sql, issue)
+                    if suggestion is not None:
+                        suggestions.setdefault(suggestion, path)
+
+    def report(self, suggestions, options):
+        if not suggestions:
+            self.stdout.write(self.style.SUCCESS(
+                'Индексы для найденных проблем не требуются.'
+            ))
+            return
+        self.stdout.write('Предлагаемые индексы:')
+        for (model, fields), path in suggestions.items():
+            index = make_index(model, fields)
+            self.stdout.write(
+                f'  {model._meta.label}: models.Index('
+                f'fields={fields!r}, name={index.name!r})  # {path}'
+            )
+        if not options['write_migration']:
+            return
+        try:
+            paths = write_index_migrations(suggestions)
+        except ValueError as error:
+            raise CommandError(error)
+        for path in paths:
+            self.stdout.write(self.style.SUCCESS(f'Записана миграция {path}'))
+        self.stdout.write(
+            'Добавьте те же индексы в Meta.indexes моделей, иначе '
+            'makemigrations предложит их удалить.'
+        )
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.constants import EXPORT_CHUNK_SIZE
+from api.export import iter_recipes_ndjson, parse_updated_since
+
+
+class Command(BaseCommand):
+    help = 'Выгрузка рецептов в формате NDJSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output', '-o',
+            help='Файл для выгрузки, по умолчанию stdout.'
+        )
+        parser.add_argument(
+            '--updated-since',
+            help='Выгрузить только рецепты, изменённые после этой даты.'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=EXPORT_CHUNK_SIZE,
+            help='Размер пачки при чтении из базы.'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            updated_since = parse_updated_since(options['updated_since'])
+        except ValueError as error:
+            raise CommandError(error)
+        rows = iter_recipes_ndjson(updated_since, options['chunk_size'])
+        if not options['output']:
+            for row in rows:
+                self.stdout.write(row, ending='')
+            return
+        with open(options['output'], 'w', encoding='utf-8') as output:
+            output.writelines(rows)
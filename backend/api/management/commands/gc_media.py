@@ -0,0 +1,58 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from api.constants import DELETE_BATCH_SIZE, MEDIA_GC_MIN_AGE_HOURS
+from api.media_gc import get_referenced_files, iter_orphans
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаление файлов из food/ и avatars/, на которые не ссылаются '
+        'рецепты и пользователи.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только вывести файлы, ничего не удаляя.'
+        )
+        parser.add_argument(
+            '--min-age', type=float, default=MEDIA_GC_MIN_AGE_HOURS,
+            help=(
+                'Не трогать файлы моложе этого числа часов: они могут '
+                'принадлежать ещё не сохранённым рецептам.'
+            )
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=DELETE_BATCH_SIZE,
+            help='Количество файлов в пачке на удаление.'
+        )
+
+    def handle(self, *args, **options):
+        referenced = get_referenced_files()
+        self.stdout.write(f'Файлов со ссылками из базы: {len(referenced)}')
+        orphans = iter_orphans(
+            default_storage, referenced, options['min_age'] * 3600
+        )
+        batch, total = [], 0
+        for name in orphans:
+            if options['dry_run']:
+                self.stdout.write(name)
+                total += 1
+                continue
+            batch.append(name)
+            if len(batch) == options['batch_size']:
+                total += self.delete(batch)
+                batch = []
+        if batch:
+            total += self.delete(batch)
+        action = 'Найдено' if options['dry_run'] else 'Удалено'
+        self.stdout.write(self.style.SUCCESS(
+            f'{action} файлов без ссылок: {total}.'
+        ))
+
+    def delete(self, batch):
+        for name in batch:
+            default_storage.delete(name)
+        self.stdout.write(f'Удалена пачка из {len(batch)} файлов')
+        return len(batch)
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from recipes.models import Recipe
+
+from api.constants import EXPORT_CHUNK_SIZE
+from api.images import generate_image_variants
+
+
+class Command(BaseCommand):
+    help = 'Построение уменьшенных WebP копий картинок рецептов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Пересобрать копии всех рецептов, а не только без копий.'
+        )
+
+    def handle(self, *args, **options):
+        queryset = Recipe.objects.all()
+        if not options['all']:
+            queryset = queryset.filter(image_variants={})
+        total = 0
+        for pk in queryset.values_list('pk', flat=True).iterator(
+            chunk_size=EXPORT_CHUNK_SIZE
+        ):
+            generate_image_variants(pk)
+            total += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано рецептов: {total}.'
+        ))
@@ -0,0 +1,67 @@
+import json
+import sys
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from api.constants import IMPORT_CHUNK_SIZE, IMPORT_WORKERS
+from api.importer import RecipeImporter
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Пакетный импорт рецептов из файла в формате JSON lines.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', help='Файл с рецептами, "-" для чтения из stdin.'
+        )
+        parser.add_argument(
+            '--author',
+            help='Email автора для строк без поля author.'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=IMPORT_CHUNK_SIZE,
+            help='Количество рецептов в одной пачке.'
+        )
+        parser.add_argument(
+            '--workers', type=int, default=IMPORT_WORKERS,
+            help='Количество потоков для записи картинок.'
+        )
+
+    def read_rows(self, lines):
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                yield None
+
+    def handle(self, *args, **options):
+        author = None
+        if options['author']:
+            author = User.objects.filter(email=options['author']).first()
+            if author is None:
+                raise CommandError(f'Автор {options["author"]} не найден.')
+        importer = RecipeImporter(
+            author=author,
+            chunk_size=options['chunk_size'],
+            workers=options['workers'],
+        )
+        if options['path'] == '-':
+            result = importer.run(self.read_rows(sys.stdin))
+        else:
+            with open(options['path'], encoding='utf-8') as lines:
+                result = importer.run(self.read_rows(lines))
+        for error in result['errors']:
+            self.stderr.write(
+                f'Строка {error["row"]}: '
+                f'{json.dumps(error["errors"], ensure_ascii=False)}'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Импортировано рецептов: {len(result["created"])}, '
+            f'ошибок: {len(result["errors"])}.'
+        ))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from api.constants import EXPORT_CHUNK_SIZE
+from api.snapshots import rebuild_snapshots
+
+
+class Command(BaseCommand):
+    help = 'Пересборка снимков всех рецептов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=EXPORT_CHUNK_SIZE,
+            help='Размер пачки при чтении и записи.'
+        )
+
+    def handle(self, *args, **options):
+        total = rebuild_snapshots(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересобрано снимков: {total}.'
+        ))
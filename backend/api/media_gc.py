@@ -0,0 +1,60 @@
+import os
+import time
+
+from django.contrib.auth import get_user_model
+from recipes.models import Recipe
+
+from .constants import EXPORT_CHUNK_SIZE, MEDIA_GC_DIRECTORIES
+
+User = get_user_model()
+
+image_field = Recipe._meta.get_field('image')
+avatar_field = User._meta.get_field('avatar')
+
+
+def get_referenced_files(chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Имена файлов, на которые ссылается база: картинки рецептов, включая
+    скрытые до удаления, их уменьшенные копии и аватары. Каждая таблица
+    читается одним проходом по values_list.
+    """
+    referenced = {avatar_field.get_default()}
+    recipes = Recipe.all_objects.values_list('image', 'image_variants')
+    for image, variants in recipes.iterator(chunk_size=chunk_size):
+        referenced.add(image)
+        referenced.update(variants.values())
+    avatars = User.objects.exclude(avatar='').values_list('avatar', flat=True)
+    referenced.update(avatars.iterator(chunk_size=chunk_size))
+    return referenced
+
+
+def iter_media_files(root, directories=MEDIA_GC_DIRECTORIES):
+    """
+    Файлы каталогов медиа с временем изменения, без построения полного
+    списка: обход os.scandir выдаёт записи по мере чтения каталога.
+    """
+    stack = [os.path.join(root, directory) for directory in directories]
+    while stack:
+        path = stack.pop()
+        try:
+            entries = os.scandir(path)
+        except FileNotFoundError:
+            continue
+        with entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    name = os.path.relpath(entry.path, root)
+                    yield (
+                        name.replace(os.sep, '/'),
+                        entry.stat(follow_symlinks=False).st_mtime,
+                    )
+
+
+def iter_orphans(storage, referenced, min_age):
+    """Файлы без ссылок из базы старше min_age секунд."""
+    threshold = time.time() - min_age
+    for name, modified in iter_media_files(storage.location):
+        if name not in referenced and modified < threshold:
+            yield name
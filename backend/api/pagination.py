@@ -1,6 +1,67 @@
+from django.core.paginator import InvalidPage
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .changes import decode_cursor, encode_cursor
 
 
 class CustomPagination(PageNumberPagination):
     page_size = 4
     page_size_query_param = 'limit'
+
+    async def apaginate_queryset(self, queryset, request):
+        """
+        Вариант paginate_queryset для async-представлений: количество
+        и строки страницы читаются асинхронным ORM.
+        """
+        self.request = request
+        paginator = self.django_paginator_class(
+            queryset, self.get_page_size(request)
+        )
+        paginator.count = await queryset.acount()
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(
+                page_number=page_number, message=str(exc)
+            ))
+        return [item async for item in self.page.object_list]
+
+
+class FeedPagination(CustomPagination):
+    """
+    Пагинация ленты по курсору (дата публикации, id) вместо номера
+    страницы: следующая страница читается от курсора, а не пропуском
+    всех предыдущих. Общего количества в ответе нет.
+    """
+
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Неверный курсор.'
+
+    def paginate_timeline(self, timeline, request):
+        self.request = request
+        try:
+            cursor = decode_cursor(
+                request.query_params.get(self.cursor_query_param)
+            )
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        rows, has_more = timeline.page(cursor, self.get_page_size(request))
+        self.next_cursor = encode_cursor(*rows[-1]) if has_more else None
+        return [pk for _, pk in rows]
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        url = remove_query_param(
+            self.request.build_absolute_uri(), self.page_query_param
+        )
+        return replace_query_param(
+            url, self.cursor_query_param, self.next_cursor
+        )
+
+    def get_paginated_response(self, data):
+        return Response({'next': self.get_next_link(), 'results': data})
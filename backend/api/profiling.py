@@ -0,0 +1,253 @@
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import random
+import re
+import time
+import uuid
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.contrib import admin
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import FileResponse, Http404
+from django.shortcuts import render
+
+from .constants import PROFILER_KEEP, PROFILER_TOP_FUNCTIONS
+
+logger = logging.getLogger(__name__)
+
+CAPTURE_ID = re.compile(r'^\d{8}T\d{6}-[0-9a-f]{8}$')
+CAPTURE_FILES = {
+    'prof': 'application/octet-stream',
+    'json': 'application/json',
+}
+
+
+class ProfileStore:
+    """
+    Кольцевой буфер профилей на диске.
+    Каждый профиль хранится парой файлов: .prof для pstats и snakeviz
+    и .json с описанием запроса и его SQL. Сверх keep старые удаляются.
+    """
+
+    def __init__(self, directory, keep=PROFILER_KEEP):
+        self.directory = directory
+        self.keep = keep
+
+    def path(self, capture_id, kind):
+        if not CAPTURE_ID.match(capture_id) or kind not in CAPTURE_FILES:
+            raise FileNotFoundError(capture_id)
+        return os.path.join(self.directory, f'{capture_id}.{kind}')
+
+    def ids(self):
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        return sorted(
+            name[:-len('.json')] for name in names
+            if name.endswith('.json') and CAPTURE_ID.match(name[:-5])
+        )
+
+    def save(self, profile, meta):
+        os.makedirs(self.directory, exist_ok=True)
+        capture_id = (
+            f'{time.strftime("%Y%m%dT%H%M%S", time.gmtime())}-'
+            f'{uuid.uuid4().hex[:8]}'
+        )
+        profile.dump_stats(self.path(capture_id, 'prof'))
+        # Описание пишется последним и атомарно: список профилей
+        # строится по .json и не видит недописанных.
+        path = self.path(capture_id, 'json')
+        with open(f'{path}.tmp', 'w', encoding='utf-8') as file:
+            json.dump({'id': capture_id, **meta}, file, ensure_ascii=False)
+        os.replace(f'{path}.tmp', path)
+        self.trim()
+        return capture_id
+
+    def trim(self):
+        for capture_id in self.ids()[:-self.keep]:
+            for kind in CAPTURE_FILES:
+                try:
+                    os.remove(self.path(capture_id, kind))
+                except FileNotFoundError:
+                    pass
+
+    def get(self, capture_id):
+        with open(self.path(capture_id, 'json'), encoding='utf-8') as file:
+            return json.load(file)
+
+    def list(self):
+        captures = []
+        for capture_id in reversed(self.ids()):
+            try:
+                captures.append(self.get(capture_id))
+            except (OSError, ValueError):
+                continue
+        return captures
+
+
+def get_store():
+    return ProfileStore(settings.PROFILER_DIR)
+
+
+class Capture:
+    """cProfile и SQL одного запроса."""
+
+    def __init__(self, sampled):
+        self.sampled = sampled
+        self.profile = cProfile.Profile()
+        self.queries = []
+        self.wrappers = ExitStack()
+        self.started = self.duration = None
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            # Параметры не сохраняются: в них бывают токены и пароли.
+            self.queries.append({
+                'sql': sql,
+                'many': many,
+                'ms': (time.perf_counter() - started) * 1000,
+            })
+
+    def start(self):
+        for connection in connections.all():
+            self.wrappers.enter_context(connection.execute_wrapper(self))
+        self.started = time.perf_counter()
+        self.profile.enable()
+
+    def stop(self):
+        self.profile.disable()
+        self.duration = time.perf_counter() - self.started
+        self.wrappers.close()
+
+    def summary(self):
+        stream = io.StringIO()
+        stats = pstats.Stats(self.profile, stream=stream)
+        stats.sort_stats('cumulative').print_stats(PROFILER_TOP_FUNCTIONS)
+        return stream.getvalue()
+
+
+class ProfilerMiddleware:
+    """
+    Выборочное профилирование представлений cProfile с записью SQL.
+    Профилируются представления из PROFILER_URL_NAMES (имя URL или
+    view_name, пустой список означает все): доля PROFILER_SAMPLE_RATE
+    запросов и, если задан PROFILER_SLOW_MS, все запросы дольше порога.
+    Для порога профилируются все запросы выбранных URL, а сохраняются
+    только медленные. Async-представления пропускаются: cProfile видит
+    только поток, в котором включён. Без PROFILER_ENABLED middleware
+    отключается и не стоит ничего.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PROFILER_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.url_names = frozenset(settings.PROFILER_URL_NAMES)
+        self.sample_rate = settings.PROFILER_SAMPLE_RATE
+        self.slow_seconds = settings.PROFILER_SLOW_MS / 1000
+        self.store = get_store()
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        capture = getattr(request, '_profiler_capture', None)
+        if capture is None:
+            return response
+        capture.stop()
+        reason = 'sample' if capture.sampled else None
+        if self.slow_seconds and capture.duration >= self.slow_seconds:
+            reason = 'slow'
+        if reason is not None:
+            self.save(request, response, capture, reason)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if iscoroutinefunction(view_func):
+            return None
+        match = request.resolver_match
+        if self.url_names and not (
+            {match.url_name, match.view_name} & self.url_names
+        ):
+            return None
+        sampled = random.random() < self.sample_rate
+        if not sampled and not self.slow_seconds:
+            return None
+        capture = Capture(sampled)
+        try:
+            capture.start()
+        except ValueError:
+            # Профилировщик уже включён, например в отладчике.
+            capture.wrappers.close()
+            return None
+        request._profiler_capture = capture
+        return None
+
+    def save(self, request, response, capture, reason):
+        user = getattr(request, 'user', None)
+        meta = {
+            'created': time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime()),
+            'method': request.method,
+            'path': request.get_full_path(),
+            'view': request.resolver_match.view_name,
+            'status': response.status_code,
+            'ms': round(capture.duration * 1000, 1),
+            'reason': reason,
+            'user': user.pk if user is not None else None,
+            'sql_ms': round(sum(query['ms'] for query in capture.queries), 1),
+            'queries': capture.queries,
+            'summary': capture.summary(),
+        }
+        try:
+            self.store.save(capture.profile, meta)
+        except OSError as error:
+            logger.warning('Профиль запроса не сохранён: %s', error)
+
+
+def _get_capture(capture_id):
+    try:
+        return get_store().get(capture_id)
+    except (OSError, ValueError):
+        raise Http404
+
+
+def profile_list(request):
+    """Список сохранённых профилей для персонала."""
+    return render(request, 'admin/profiles/list.html', {
+        **admin.site.each_context(request),
+        'title': 'Профили запросов',
+        'captures': get_store().list(),
+        'enabled': settings.PROFILER_ENABLED,
+    })
+
+
+def profile_detail(request, capture_id):
+    capture = _get_capture(capture_id)
+    return render(request, 'admin/profiles/detail.html', {
+        **admin.site.each_context(request),
+        'title': f'{capture["method"]} {capture["path"]}',
+        'capture': capture,
+    })
+
+
+def profile_download(request, capture_id, kind):
+    try:
+        path = get_store().path(capture_id, kind)
+        file = open(path, 'rb')
+    except OSError:
+        raise Http404
+    return FileResponse(
+        file,
+        as_attachment=True,
+        filename=os.path.basename(path),
+        content_type=CAPTURE_FILES[kind],
+    )
@@ -1,19 +1,76 @@
 from django.contrib.auth import get_user_model
+from django.db import transaction
 from djoser.serializers import UserCreateSerializer, UserSerializer
 from drf_extra_fields.fields import Base64ImageField
 from recipes.models import (Cart, Favorite, IngredientAmount,
                             Recipe, Tag)
+from jobs.queue import enqueue
 from rest_framework import serializers
 from users.models import Follow
 from .constants import (MIN_COOKING_TIME, MAX_COOKING_TIME,
                         MIN_INGREDIENT_AMOUNT, MAX_INGREDIENT_AMOUNT)
 from rest_framework.exceptions import ValidationError
 from recipes.models import Ingredient
+from .events import RECIPE_CREATED, RECIPE_UPDATED, notify_followers
+from .feed import fan_out_recipe
+from .images import generate_image_variants, get_variant_urls
+from .uploads import StreamingBase64ImageField
 
 User = get_user_model()
 
 
-class CustomUserSerializer(UserSerializer):
+def get_requested_fields(request, available):
+    """
+    Поля ответа с учётом параметров ?fields= и ?omit=.
+    Неизвестные имена полей игнорируются.
+    """
+    fields = set(available)
+    if request is None:
+        return fields
+    only = request.query_params.get('fields')
+    omit = request.query_params.get('omit')
+    if only:
+        fields &= {name.strip() for name in only.split(',')}
+    if omit:
+        fields -= {name.strip() for name in omit.split(',')}
+    return fields
+
+
+def get_representation_cache(context):
+    """
+    Кэш представлений вложенных объектов на время жизни контекста.
+    Контекст общий для всего дерева сериализаторов, а пересборка снимков
+    передаёт один контекст на пачку рецептов, поэтому автор или
+    ингредиент, встречающийся в пачке несколько раз, сериализуется
+    один раз.
+    """
+    return context.setdefault('representation_cache', {})
+
+
+class SparseFieldsetMixin:
+    """Отбрасывает поля, не запрошенные через ?fields= и ?omit=."""
+
+    def is_top_level(self):
+        if self.parent is None:
+            return True
+        return (
+            isinstance(self.parent, serializers.ListSerializer)
+            and self.parent.parent is None
+        )
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get('request')
+        if request is None or not self.is_top_level():
+            return fields
+        requested = get_requested_fields(request, fields)
+        return {
+            name: field for name, field in fields.items()
+            if name in requested
+        }
+
+
+class CustomUserSerializer(SparseFieldsetMixin, UserSerializer):
     """Пользователи [GET]"""
 
     is_subscribed = serializers.SerializerMethodField(
@@ -33,10 +90,19 @@ class CustomUserSerializer(UserSerializer):
             'avatar'
         )
 
+    def to_representation(self, instance):
+        cache = get_representation_cache(self.context)
+        key = ('user', instance.pk, tuple(self.fields))
+        if key not in cache:
+            cache[key] = super().to_representation(instance)
+        return dict(cache[key])
+
     def get_is_subscribed(self, obj):
         request = self.context.get('request')
         if request is None or request.user.is_anonymous:
             return False
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         return obj.following.filter(user=request.user).exists()
 
     def get_avatar(self, obj):
@@ -221,6 +287,17 @@ class IngredientAmountReadSerializer(serializers.ModelSerializer):
         model = IngredientAmount
         fields = ('id', 'name', 'measurement_unit', 'amount')
 
+    def to_representation(self, instance):
+        cache = get_representation_cache(self.context)
+        key = ('ingredient', instance.ingredient_id)
+        if key not in cache:
+            cache[key] = super().to_representation(instance)
+        data = dict(cache[key])
+        data['amount'] = self.fields['amount'].to_representation(
+            instance.amount
+        )
+        return data
+
 
 class IngredientAmountWriteSerializer(serializers.ModelSerializer):
     id = serializers.IntegerField()
@@ -236,7 +313,7 @@ class IngredientAmountWriteSerializer(serializers.ModelSerializer):
 
 class RecipeWriteSerializer(serializers.ModelSerializer):
     ingredients = IngredientAmountWriteSerializer(many=True)
-    image = Base64ImageField()
+    image = StreamingBase64ImageField()
     cooking_time = serializers.IntegerField(
         min_value=MIN_COOKING_TIME,
         max_value=MAX_COOKING_TIME
@@ -258,6 +335,19 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
             existing = Ingredient.objects.filter(id__in=ingredient_ids)
             if len(existing) != len(set(ingredient_ids)):
                 raise serializers.ValidationError('Ингредиентов нет.')
+        name = data.get('name')
+        if name is not None:
+            author = (
+                self.instance.author if self.instance is not None
+                else self.context['request'].user
+            )
+            duplicates = Recipe.objects.filter(author=author, name=name)
+            if self.instance is not None:
+                duplicates = duplicates.exclude(pk=self.instance.pk)
+            if duplicates.exists():
+                raise serializers.ValidationError({
+                    'name': 'У вас уже есть рецепт с таким названием.'
+                })
         return data
 
     def validate_image(self, image):
@@ -277,30 +367,46 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
             )
         IngredientAmount.objects.bulk_create(objs)
 
+    @transaction.atomic
     def create(self, validated_data):
         ingredients = validated_data.pop('ingredients')
         recipe = Recipe.objects.create(**validated_data)
         self.create_ingredients(ingredients, recipe)
+        self.save_snapshot(recipe)
+        enqueue(fan_out_recipe, recipe.pk)
+        enqueue(generate_image_variants, recipe.pk)
+        notify_followers(recipe, RECIPE_CREATED)
         return recipe
 
+    def save_snapshot(self, recipe):
+        from .snapshots import rebuild_snapshots
+        rebuild_snapshots(Recipe.objects.filter(pk=recipe.pk))
+
     def to_representation(self, instance):
         return RecipeReadSerializer(
             instance,
             context=self.context
         ).data
 
+    @transaction.atomic
     def update(self, instance, validated_data):
 
         ingredients = validated_data.pop('ingredients', None)
 
-        for attr, value in validated_data.items():
-            setattr(instance, attr, value)
-        instance.save()
-
         if ingredients is not None:
             instance.ingredients.clear()
             self.create_ingredients(ingredients, instance)
 
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        if 'image' in validated_data:
+            instance.image_variants = {}
+        instance.save()
+        if 'image' in validated_data:
+            enqueue(generate_image_variants, instance.pk)
+
+        self.save_snapshot(instance)
+        notify_followers(instance, RECIPE_UPDATED)
         return instance
 
     def validate_ingredients(self, ingredients):
@@ -325,11 +431,13 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
         return ingredients
 
 
-class RecipeReadSerializer(serializers.ModelSerializer):
+class RecipeReadSerializer(SparseFieldsetMixin,
+                           serializers.ModelSerializer):
     author = CustomUserSerializer()
     ingredients = IngredientAmountReadSerializer(source='ingredient_in_recipe',
                                                  many=True, read_only=True)
     image = Base64ImageField()
+    image_variants = serializers.SerializerMethodField()
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
 
@@ -343,18 +451,26 @@ class RecipeReadSerializer(serializers.ModelSerializer):
             'is_in_shopping_cart',
             'name',
             'image',
+            'image_variants',
             'text',
             'cooking_time'
         )
 
-    def is_exists_in(self, obj, model):
+    def is_exists_in(self, obj, model, annotation):
         request = self.context.get('request')
         if request is None or request.user.is_anonymous:
             return False
+        if hasattr(obj, annotation):
+            return getattr(obj, annotation)
         return model.objects.filter(user=request.user, recipe=obj).exists()
 
+    def get_image_variants(self, obj):
+        return get_variant_urls(
+            obj.image_variants, self.context.get('request')
+        )
+
     def get_is_favorited(self, obj):
-        return self.is_exists_in(obj, Favorite)
+        return self.is_exists_in(obj, Favorite, 'is_favorited')
 
     def get_is_in_shopping_cart(self, obj):
-        return self.is_exists_in(obj, Cart)
+        return self.is_exists_in(obj, Cart, 'is_in_shopping_cart')
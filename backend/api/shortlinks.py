@@ -0,0 +1,105 @@
+import secrets
+import string
+import threading
+from collections import OrderedDict
+
+from django.db import IntegrityError, transaction
+from recipes.models import Recipe, ShortLink
+
+from .cache import RECIPES_NAMESPACE, get_namespace_version
+from .constants import (SHORT_LINK_ATTEMPTS, SHORT_LINK_CACHE_SIZE,
+                        SHORT_LINK_LENGTH)
+
+BASE62 = string.digits + string.ascii_letters
+
+
+def generate_code(length=SHORT_LINK_LENGTH):
+    """Случайный base62 код: 62**6 вариантов, перебор id не работает."""
+    return ''.join(secrets.choice(BASE62) for _ in range(length))
+
+
+def get_short_code(recipe_id):
+    """
+    Код рецепта, создаётся при первом запросе ссылки.
+    Совпадение кода ловит уникальный индекс, тогда берётся новый код;
+    одновременное создание ссылки для того же рецепта возвращает
+    сохранённую другим запросом.
+    """
+    for _ in range(SHORT_LINK_ATTEMPTS):
+        code = (
+            ShortLink.objects.filter(recipe_id=recipe_id)
+            .values_list('code', flat=True)
+            .first()
+        )
+        if code is not None:
+            return code
+        try:
+            with transaction.atomic():
+                return ShortLink.objects.create(
+                    recipe_id=recipe_id, code=generate_code()
+                ).code
+        except IntegrityError:
+            continue
+    raise IntegrityError(
+        f'Не удалось подобрать короткий код для рецепта {recipe_id}.'
+    )
+
+
+class LRUCache:
+    """Потокобезопасный LRU кэш в памяти процесса."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+
+_codes = LRUCache(SHORT_LINK_CACHE_SIZE)
+
+
+def resolve_short_code(code):
+    """
+    Id живого рецепта по коду или None.
+    Код рецепта не меняется, поэтому найденные пары кэшируются вместе
+    с поколением кэша рецептов. Скрытие и удаление рецепта меняют
+    поколение, и при попадании со старым поколением рецепт проверяется
+    по первичному ключу; скрытый рецепт вытесняется из кэша.
+    Неизвестные коды не кэшируются.
+    """
+    generation = get_namespace_version(RECIPES_NAMESPACE)
+    cached = _codes.get(code)
+    if cached is not None:
+        recipe_id, cached_generation = cached
+        if cached_generation == generation:
+            return recipe_id
+        if Recipe.objects.filter(pk=recipe_id).exists():
+            _codes.set(code, (recipe_id, generation))
+            return recipe_id
+        _codes.delete(code)
+        return None
+    recipe_id = (
+        Recipe.objects.filter(short_link__code=code)
+        .values_list('pk', flat=True)
+        .first()
+    )
+    if recipe_id is not None:
+        _codes.set(code, (recipe_id, generation))
+    return recipe_id
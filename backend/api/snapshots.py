@@ -0,0 +1,138 @@
+from asgiref.sync import sync_to_async
+from django.db.models import Prefetch
+from recipes.models import IngredientAmount, Recipe, RecipeSnapshot
+
+from .constants import EXPORT_CHUNK_SIZE
+from .serializers import (CustomUserSerializer, RecipeReadSerializer,
+                          get_requested_fields)
+
+USER_FLAGS = ('is_favorited', 'is_in_shopping_cart')
+
+
+def get_snapshot_queryset():
+    return Recipe.objects.select_related('author').prefetch_related(
+        Prefetch(
+            'ingredient_in_recipe',
+            queryset=IngredientAmount.objects.select_related('ingredient')
+        )
+    )
+
+
+def render_snapshot(recipe, context):
+    """
+    Представление рецепта без флагов пользователя.
+    Сериализатор вызывается без запроса, поэтому картинка хранится
+    относительной ссылкой и дополняется хостом при чтении.
+    """
+    data = RecipeReadSerializer(recipe, context=context).data
+    for flag in USER_FLAGS:
+        data.pop(flag)
+    data['author'].pop('is_subscribed')
+    return data
+
+
+def make_snapshots(recipes):
+    # Общий контекст пачки: автор и ингредиенты, повторяющиеся в её
+    # рецептах, сериализуются по одному разу.
+    context = {}
+    return [
+        RecipeSnapshot(
+            recipe=recipe,
+            data=render_snapshot(recipe, context),
+            version=recipe.version,
+        )
+        for recipe in recipes
+    ]
+
+
+def save_snapshots(snapshots):
+    RecipeSnapshot.objects.bulk_create(
+        snapshots,
+        update_conflicts=True,
+        unique_fields=('recipe',),
+        update_fields=('data', 'version'),
+    )
+
+
+def rebuild_snapshots(queryset=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """Пересборка снимков рецептов пачками, возвращает их количество."""
+    queryset = get_snapshot_queryset().filter(
+        pk__in=(queryset if queryset is not None else Recipe.objects.all())
+        .values('pk')
+    )
+    chunk, total = [], 0
+    for recipe in queryset.iterator(chunk_size=chunk_size):
+        chunk.append(recipe)
+        if len(chunk) == chunk_size:
+            save_snapshots(make_snapshots(chunk))
+            total += len(chunk)
+            chunk = []
+    if chunk:
+        save_snapshots(make_snapshots(chunk))
+        total += len(chunk)
+    return total
+
+
+def rebuild_author_snapshots(author_id):
+    """Пересборка снимков рецептов автора после изменения профиля."""
+    return rebuild_snapshots(Recipe.objects.filter(author_id=author_id))
+
+
+def _snapshot_data(pk, version):
+    return RecipeSnapshot.objects.filter(
+        recipe_id=pk, version=version
+    ).values_list('data', flat=True)
+
+
+def get_snapshot(pk, version):
+    """Данные снимка актуальной версии, при отсутствии снимок строится."""
+    data = _snapshot_data(pk, version).first()
+    if data is not None:
+        return data
+    recipe = get_snapshot_queryset().get(pk=pk)
+    snapshot, = make_snapshots([recipe])
+    save_snapshots([snapshot])
+    return snapshot.data
+
+
+async def aget_snapshot(pk, version):
+    """
+    Вариант get_snapshot для async-представлений.
+    Сборка отсутствующего снимка идёт через сериализатор и остаётся
+    синхронной.
+    """
+    data = await _snapshot_data(pk, version).afirst()
+    if data is not None:
+        return data
+    return await sync_to_async(get_snapshot)(pk, version)
+
+
+def splice_user_flags(data, request, state):
+    """Ответ RecipeReadSerializer из снимка и флагов пользователя."""
+    fields = get_requested_fields(request, RecipeReadSerializer.Meta.fields)
+    result = {}
+    for name in RecipeReadSerializer.Meta.fields:
+        if name not in fields:
+            continue
+        if name == 'author':
+            author = data['author']
+            result[name] = {
+                field: (
+                    state['is_subscribed'] if field == 'is_subscribed'
+                    else author[field]
+                )
+                for field in CustomUserSerializer.Meta.fields
+            }
+        elif name in USER_FLAGS:
+            result[name] = state[name]
+        elif name == 'image' and data['image']:
+            result[name] = request.build_absolute_uri(data['image'])
+        elif name == 'image_variants':
+            result[name] = {
+                variant: request.build_absolute_uri(url)
+                # Снимки до появления поля копий картинки его не содержат.
+                for variant, url in data.get('image_variants', {}).items()
+            }
+        else:
+            result[name] = data[name]
+    return result
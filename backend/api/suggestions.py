@@ -0,0 +1,113 @@
+import heapq
+import math
+from collections import defaultdict
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef, Sum
+from recipes.models import Favorite
+from users.models import AuthorSimilarity, Follow
+
+from .constants import (EXPORT_CHUNK_SIZE, SUGGESTIONS_FAVORITE_WEIGHT,
+                        SUGGESTIONS_LIMIT, SUGGESTIONS_NEIGHBOURS)
+
+User = get_user_model()
+
+
+def _overlaps(model, author_lookup, author_id):
+    """
+    Косинусная близость авторов по пользователям model: число общих
+    пользователей, делённое на корень из произведения их количеств.
+    Рассматриваются не больше SUGGESTIONS_NEIGHBOURS авторов с самым
+    большим пересечением.
+    """
+    own = model.objects.filter(**{author_lookup: author_id})
+    own_total = own.aggregate(total=Count('user', distinct=True))['total']
+    if not own_total:
+        return {}
+    overlaps = dict(
+        model.objects.filter(user__in=own.values('user'))
+        .exclude(**{author_lookup: author_id})
+        .values(author_lookup)
+        .annotate(overlap=Count('user', distinct=True))
+        .order_by('-overlap', author_lookup)
+        .values_list(author_lookup, 'overlap')[:SUGGESTIONS_NEIGHBOURS]
+    )
+    totals = dict(
+        model.objects.filter(**{f'{author_lookup}__in': list(overlaps)})
+        .order_by()
+        .values(author_lookup)
+        .annotate(total=Count('user', distinct=True))
+        .values_list(author_lookup, 'total')
+    )
+    return {
+        author: overlap / math.sqrt(own_total * totals[author])
+        for author, overlap in overlaps.items()
+    }
+
+
+def score_authors(author_id):
+    """
+    Похожие на author_id авторы: с общими подписчиками и авторы
+    рецептов, которые добавляют в избранное те же пользователи.
+    """
+    scores = defaultdict(float)
+    for author, score in _overlaps(Follow, 'author', author_id).items():
+        scores[author] += score
+    for author, score in _overlaps(
+        Favorite, 'recipe__author', author_id
+    ).items():
+        scores[author] += score * SUGGESTIONS_FAVORITE_WEIGHT
+    return scores
+
+
+def refresh_similar_authors(author_id, limit=SUGGESTIONS_LIMIT):
+    """Пересчёт top-K похожих авторов одного автора."""
+    if not User.objects.filter(
+        pk=author_id, deleted_at__isnull=True
+    ).exists():
+        return 0
+    top = heapq.nlargest(
+        limit, score_authors(author_id).items(),
+        key=lambda item: (item[1], -item[0])
+    )
+    with transaction.atomic():
+        AuthorSimilarity.objects.filter(author_id=author_id).delete()
+        AuthorSimilarity.objects.bulk_create(
+            AuthorSimilarity(author_id=author_id, similar_id=similar,
+                             score=score)
+            for similar, score in top
+        )
+    return len(top)
+
+
+def get_author_ids():
+    """Авторы с подписчиками или рецептами в чьём-то избранном."""
+    return (
+        User.objects.filter(
+            deleted_at__isnull=True
+        ).filter(
+            Exists(Follow.objects.filter(author=OuterRef('pk')))
+            | Exists(Favorite.objects.filter(recipe__author=OuterRef('pk')))
+        )
+        .values_list('pk', flat=True)
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+
+
+def get_suggested_users(user):
+    """
+    Рекомендации пользователю: авторы, похожие на тех, на кого он
+    подписан, по сумме оценок. Читается не больше
+    SUGGESTIONS_LIMIT строк на каждую подписку.
+    """
+    followed = Follow.objects.filter(user=user).values('author')
+    return (
+        User.objects.filter(
+            similar_to__author__in=followed, deleted_at__isnull=True
+        )
+        .exclude(pk=user.pk)
+        .exclude(following__user=user)
+        .annotate(suggestion_score=Sum('similar_to__score'))
+        .order_by('-suggestion_score', 'pk')
+    )
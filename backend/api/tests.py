@@ -0,0 +1,232 @@
+import io
+import shutil
+import tempfile
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.db import OperationalError, connections
+from django.test import (RequestFactory, SimpleTestCase, TestCase,
+                         TransactionTestCase, override_settings)
+from PIL import Image
+from recipes.models import (Cart, Favorite, Ingredient, IngredientAmount,
+                            Recipe, Tag)
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from users.models import Follow
+
+from api import db_router
+from api.fast_serializers import FastRecipeListSerializer
+from api import renderers
+from api.renderers import FastJSONParser, FastJSONRenderer
+from api.serializers import RecipeReadSerializer, get_requested_fields
+from api.views import RecipeViewSet
+
+User = get_user_model()
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+# Отстающая реплика объявлена в foodgram.test_settings.
+REPLICA = 'stale_replica'
+HAS_REPLICA = REPLICA in settings.DATABASES
+
+QUERIES = (
+    '',
+    'fields=id,author,name',
+    'omit=ingredients,text',
+    'fields=is_favorited,is_in_shopping_cart',
+    'tags=breakfast',
+    'author={author}',
+)
+
+
+def make_image():
+    buffer = io.BytesIO()
+    Image.new('RGB', (4, 4)).save(buffer, 'PNG')
+    return ContentFile(buffer.getvalue(), name='recipe.png')
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, CACHES={'default': {
+    'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+}})
+class FastRecipeListSerializerTest(TestCase):
+    """Быстрый список рецептов совпадает с RecipeReadSerializer байт в байт."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.authors = [
+            User.objects.create_user(
+                email=f'author{number}@foodgram.ru',
+                username=f'author{number}',
+                first_name='Имя',
+                last_name='Фамилия',
+                password='password',
+            )
+            for number in range(3)
+        ]
+        cls.authors[2].avatar = None
+        cls.authors[2].save()
+        cls.reader = User.objects.create_user(
+            email='reader@foodgram.ru', username='reader',
+            first_name='Имя', last_name='Фамилия', password='password',
+        )
+        ingredients = [
+            Ingredient.objects.create(name=f'Мука {number}',
+                                      measurement_unit='г')
+            for number in range(4)
+        ]
+        tags = [
+            Tag.objects.create(name='Завтрак', color='#E26C2D',
+                               slug='breakfast'),
+            Tag.objects.create(name='Обед', color='#49B64E', slug='lunch'),
+        ]
+        cls.recipes = []
+        for number in range(8):
+            recipe = Recipe.objects.create(
+                name=f'Рецепт «{number}»',
+                author=cls.authors[number % 3],
+                text='Описание\nв две строки',
+                cooking_time=number + 1,
+                image=make_image(),
+            )
+            for offset in range(number % 3 + 1):
+                IngredientAmount.objects.create(
+                    recipe=recipe,
+                    ingredient=ingredients[(number + offset) % 4],
+                    amount=offset + 1,
+                )
+            recipe.tags.add(tags[number % 2])
+            cls.recipes.append(recipe)
+        cls.recipes[1].image_variants = {
+            'thumbnail': 'food/variants/1-320.webp'
+        }
+        cls.recipes[1].save()
+        Favorite.objects.create(user=cls.reader, recipe=cls.recipes[0])
+        Cart.objects.create(user=cls.reader, recipe=cls.recipes[3])
+        Follow.objects.create(user=cls.reader, author=cls.authors[0])
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def render_both(self, query, user):
+        request = Request(RequestFactory().get(f'/api/recipes/?{query}'))
+        request.user = user
+        view = RecipeViewSet(
+            action='list', request=request, format_kwarg=None
+        )
+        context = view.get_serializer_context()
+        queryset = view.filter_queryset(view.get_queryset())
+        expected = RecipeReadSerializer(
+            queryset, many=True, context=context
+        ).data
+        serializer = FastRecipeListSerializer(
+            context,
+            get_requested_fields(request, RecipeReadSerializer.Meta.fields)
+        )
+        actual = serializer.to_representation(serializer.get_queryset(
+            view.filter_queryset(Recipe.objects.all())
+        ))
+        renderer = FastJSONRenderer()
+        return renderer.render(expected), renderer.render(actual)
+
+    def test_output_matches_serializer(self):
+        for user in (AnonymousUser(), self.reader):
+            for query in QUERIES:
+                query = query.format(author=self.authors[0].pk)
+                with self.subTest(user=str(user), query=query):
+                    expected, actual = self.render_both(query, user)
+                    self.assertTrue(expected.startswith(b'[{'))
+                    self.assertEqual(actual, expected)
+
+
+class FastJSONTest(SimpleTestCase):
+    """С orjson и без него рендерер и парсер дают одинаковый результат."""
+
+    DATA = {
+        'name': 'Борщ\u2028с «салом»',
+        'cooking_time': 90,
+        'tags': [{'id': 1, 'slug': 'lunch'}],
+        'image': None,
+        'is_favorited': True,
+    }
+
+    def round_trip(self):
+        content = FastJSONRenderer().render(self.DATA)
+        return content, FastJSONParser().parse(io.BytesIO(content))
+
+    def test_fallback_matches_json_renderer(self):
+        with mock.patch.object(renderers, 'orjson', None):
+            content, parsed = self.round_trip()
+        self.assertEqual(content, JSONRenderer().render(self.DATA))
+        self.assertEqual(parsed, self.DATA)
+
+    def test_orjson_matches_fallback(self):
+        if renderers.orjson is None:
+            self.skipTest('orjson не установлен.')
+        with mock.patch.object(renderers, 'orjson', None):
+            expected = FastJSONRenderer().render(self.DATA)
+        content, parsed = self.round_trip()
+        self.assertEqual(content, expected)
+        self.assertEqual(parsed, self.DATA)
+
+
+@override_settings(REPLICA_DATABASES=[REPLICA], CACHES={'default': {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    'LOCATION': 'replica-router-test',
+}})
+@skipUnless(HAS_REPLICA, 'Запускайте с --settings=foodgram.test_settings.')
+class ReplicaRouterTest(TransactionTestCase):
+    """Чтение с реплики, закрепление после записи и отказ реплики."""
+
+    # Без реплики тест пропускается, но исполнитель тестов всё равно
+    # собирает базы из databases.
+    databases = {'default', REPLICA} if HAS_REPLICA else set()
+
+    def setUp(self):
+        cache.clear()
+        db_router._down_until.clear()
+        db_router._checked_until.clear()
+        # Таблицы реплики не мигрируются и не очищаются между тестами.
+        replica = connections[REPLICA]
+        with replica.schema_editor() as editor:
+            if Tag._meta.db_table in replica.introspection.table_names():
+                editor.delete_model(Tag)
+            editor.create_model(Tag)
+        Tag.objects.using(REPLICA).create(
+            name='Старый', color='#000000', slug='stale'
+        )
+        Tag.objects.create(name='Новый', color='#FFFFFF', slug='fresh')
+
+    def get_slugs(self):
+        response = self.client.get('/api/tags/')
+        self.assertEqual(response.status_code, 200)
+        return [tag['slug'] for tag in response.json()]
+
+    def test_safe_request_reads_replica(self):
+        self.assertEqual(self.get_slugs(), ['stale'])
+
+    def test_client_is_pinned_after_write(self):
+        self.client.post('/api/tags/', {})
+        self.assertEqual(self.get_slugs(), ['fresh'])
+
+    def test_unavailable_replica_is_skipped(self):
+        with mock.patch.object(
+            connections[REPLICA], 'ensure_connection',
+            side_effect=OperationalError('нет соединения'),
+        ):
+            self.assertEqual(self.get_slugs(), ['fresh'])
+        self.assertEqual(self.get_slugs(), ['fresh'])
+
+    def test_replica_failure_retries_on_primary(self):
+        with connections[REPLICA].schema_editor() as editor:
+            editor.delete_model(Tag)
+        # Первая попытка запроса завершается ошибкой, которую клиент
+        # тестов иначе выбросил бы после ответа.
+        self.client.raise_request_exception = False
+        self.assertEqual(self.get_slugs(), ['fresh'])
+        self.assertIn(REPLICA, db_router._down_until)
@@ -0,0 +1,137 @@
+import base64
+import binascii
+import io
+import tempfile
+import uuid
+
+from django.core.files import File
+from drf_extra_fields.fields import Base64ImageField
+from PIL import Image
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+from .constants import (UPLOAD_DECODE_CHUNK, UPLOAD_MAX_BYTES,
+                        UPLOAD_MAX_PIXELS, UPLOAD_SPOOL_SIZE)
+
+IMAGE_SIGNATURES = (
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'\xff\xd8\xff', 'jpg'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+)
+INVALID_IMAGE = 'Неверный формат изображения.'
+# Длиннее заголовок data URL с картинкой не бывает.
+DATA_URL_HEADER_LENGTH = 256
+
+
+def detect_image_format(header):
+    """Формат картинки по первым байтам, а не по заявленному типу."""
+    for signature, extension in IMAGE_SIGNATURES:
+        if header.startswith(signature):
+            return extension
+    if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+        return 'webp'
+    return None
+
+
+def _payload_start(data):
+    """
+    Начало base64 в строке или data URL. Разделитель ищется только в
+    начале строки, чтобы не копировать её целиком.
+    """
+    if not data.startswith('data:'):
+        return 0
+    header = data[:DATA_URL_HEADER_LENGTH]
+    separator = header.find(';base64,')
+    if separator == -1 or not header.startswith('data:image/'):
+        raise ValidationError(INVALID_IMAGE)
+    return separator + len(';base64,')
+
+
+def _check_pixels(spool, max_pixels):
+    """
+    Проверка размеров по заголовку уже записанной части картинки.
+    False, если заголовок ещё не записан целиком.
+    """
+    spool.seek(0)
+    try:
+        with Image.open(spool) as image:
+            width, height = image.size
+    except (OSError, SyntaxError):
+        return False
+    finally:
+        spool.seek(0, io.SEEK_END)
+    if width * height > max_pixels:
+        raise ValidationError(f'Изображение больше {max_pixels} пикселей.')
+    return True
+
+
+def decode_base64_image(data, max_bytes=UPLOAD_MAX_BYTES,
+                        max_pixels=UPLOAD_MAX_PIXELS):
+    """
+    Картинка из base64 строки или data URL.
+    Строка декодируется кусками во временный файл, который остаётся в
+    памяти до UPLOAD_SPOOL_SIZE байт, без промежуточных копий всей
+    строки. Размер проверяется до декодирования, формат по первым
+    байтам, а размеры в пикселях по заголовку из первого куска, до
+    декодирования остальных.
+    """
+    if not isinstance(data, str):
+        raise ValidationError(INVALID_IMAGE)
+    offset = _payload_start(data)
+    length = len(data) - offset
+    if length // 4 * 3 > max_bytes:
+        raise ValidationError(
+            f'Размер изображения больше {max_bytes // (1024 * 1024)} МБ.'
+        )
+    if not length or length % 4:
+        raise ValidationError(INVALID_IMAGE)
+    spool = tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_SIZE)
+    image_file = extension = None
+    try:
+        checked = False
+        for start in range(offset, len(data), UPLOAD_DECODE_CHUNK):
+            chunk = base64.b64decode(
+                data[start:start + UPLOAD_DECODE_CHUNK], validate=True
+            )
+            if extension is None:
+                extension = detect_image_format(chunk[:12])
+                if extension is None:
+                    raise ValidationError(INVALID_IMAGE)
+            spool.write(chunk)
+            if start == offset:
+                checked = _check_pixels(spool, max_pixels)
+        spool.seek(0)
+        with Image.open(spool) as image:
+            if not checked:
+                width, height = image.size
+                if width * height > max_pixels:
+                    raise ValidationError(
+                        f'Изображение больше {max_pixels} пикселей.'
+                    )
+            image.verify()
+        spool.seek(0)
+        image_file = File(spool, name=f'{uuid.uuid4()}.{extension}')
+    except (binascii.Error, ValueError, OSError, Image.DecompressionBombError):
+        raise ValidationError(INVALID_IMAGE)
+    finally:
+        if image_file is None:
+            spool.close()
+    return image_file
+
+
+class StreamingBase64ImageField(Base64ImageField):
+    """
+    Base64ImageField с потоковым декодированием decode_base64_image.
+    Картинка уже проверена Pillow, поэтому повторная проверка
+    ImageField, читающая файл целиком в память, пропускается.
+    """
+
+    def to_internal_value(self, data):
+        if data in self.EMPTY_VALUES:
+            return None
+        if not isinstance(data, str):
+            raise ValidationError(self.INVALID_TYPE_MESSAGE)
+        return serializers.FileField.to_internal_value(
+            self, decode_base64_image(data)
+        )
@@ -1,8 +1,11 @@
 from django.urls import include, path
 from rest_framework.routers import SimpleRouter
 
-from .views import (FollowToView, FollowView, IngredientViewSet, RecipeViewSet,
-                    TagViewSet, UserViewSet)
+from .async_views import (ingredient_list, recipe_detail, recipe_list,
+                          subscription_list, tag_list)
+from .events import recipe_events
+from .views import (FeedView, FollowToView, FollowView, IngredientViewSet,
+                    RecipeViewSet, TagViewSet, UserViewSet)
 
 app_name = 'api'
 
@@ -15,6 +18,13 @@ router.register('recipes', RecipeViewSet, basename='recipes')
 
 
 urlpatterns = [
+    path('feed/', FeedView.as_view()),
+    path('events/', recipe_events),
+    path('async/tags/', tag_list),
+    path('async/ingredients/', ingredient_list),
+    path('async/recipes/', recipe_list),
+    path('async/recipes/<int:pk>/', recipe_detail),
+    path('async/users/subscriptions/', subscription_list),
     path('users/subscriptions/', FollowView.as_view()),
     path('users/<int:pk>/subscribe/', FollowToView.as_view()),
     path('', include(router.urls)),
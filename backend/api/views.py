@@ -1,29 +1,45 @@
 from rest_framework.reverse import reverse
-from .filters import RecipeFilter
-from .pagination import CustomPagination
+from .filters import RecipeFilter, get_tag_facets
+from .pagination import CustomPagination, FeedPagination
 from django.contrib.auth import get_user_model
-from django.db.models import Sum
-from django.shortcuts import get_object_or_404
+from django.db.models import Exists, OuterRef, Prefetch, Sum, Value
+from .fast_serializers import FastRecipeListSerializer, annotate_recipe_flags
+from django.shortcuts import get_object_or_404, redirect
 from django_filters.rest_framework import DjangoFilterBackend
 from recipes.models import (Cart, Favorite, Ingredient, IngredientAmount,
                             Recipe, Tag)
 from rest_framework import filters, status, views, viewsets
 from rest_framework.decorators import action
 from rest_framework.generics import ListAPIView
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import (AllowAny, IsAdminUser,
+                                        IsAuthenticated)
 from rest_framework.response import Response
 from rest_framework.validators import ValidationError
-from django.core.files.base import ContentFile
-import base64
-import uuid
-from django.http import HttpResponse
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from .cache import RECIPES_NAMESPACE, TAGS_NAMESPACE, AnonymousCacheMixin
+from .changes import decode_cursor, get_changes
+from .conditional import (conditional_response, get_detail_validators,
+                          get_list_validators, get_recipe_state,
+                          set_validators)
+from .feed import FeedTimeline
+from .deletion import hide_recipe, hide_user
+from .constants import EVENTS_TICKET_MAX_AGE
+from .events import make_ticket
+from .export import iter_recipes_ndjson, parse_updated_since
+from .importer import RecipeImporter
+from .uploads import decode_base64_image
+from .suggestions import get_suggested_users
+from .shortlinks import get_short_code, resolve_short_code
+from .snapshots import get_snapshot, splice_user_flags
 from .permissions import AdminOrReadOnly, IsOwnerOrReadOnly
 from .serializers import (CustomUserPostSerializer, CustomUserSerializer,
                           FollowSerializer, FollowToSerializer,
                           IngredientSerializer, PasswordSerializer,
                           RecipePartSerializer, TagSerializer,
                           RecipeReadSerializer, RecipeWriteSerializer,
+                          get_requested_fields,
                           )
+from users.models import Follow
 
 User = get_user_model()
 
@@ -41,14 +57,62 @@ class UserViewSet(viewsets.ModelViewSet):
             return CustomUserSerializer
         return CustomUserPostSerializer
 
+    def get_queryset(self):
+        queryset = User.objects.filter(deleted_at__isnull=True)
+        user = self.request.user
+        fields = get_requested_fields(
+            self.request, CustomUserSerializer.Meta.fields
+        )
+        if (self.action in ('list', 'retrieve')
+                and user.is_authenticated and 'is_subscribed' in fields):
+            queryset = queryset.annotate(is_subscribed=Exists(
+                Follow.objects.filter(user=user, author=OuterRef('pk'))
+            ))
+        return queryset
+
+    def destroy(self, request, *args, **kwargs):
+        user = self.get_object()
+        if not request.user.is_authenticated or not (
+            request.user == user or request.user.is_staff
+        ):
+            return Response(
+                {'detail': 'Удалить можно только свою учётную запись.'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        hide_user(user)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
     @action(
         methods=["get"], detail=False, permission_classes=[IsAuthenticated]
     )
     def me(self, request, *args, **kwargs):
         user = get_object_or_404(User, pk=request.user.id)
-        serializer = CustomUserSerializer(user)
+        serializer = CustomUserSerializer(user, context={'request': request})
         return Response(serializer.data)
 
+    @action(
+        methods=["get"], detail=False, permission_classes=[IsAuthenticated]
+    )
+    def suggestions(self, request):
+        queryset = get_suggested_users(request.user).annotate(
+            is_subscribed=Value(False)
+        )
+        page = self.paginate_queryset(queryset)
+        serializer = CustomUserSerializer(
+            page, many=True, context=self.get_serializer_context()
+        )
+        return self.get_paginated_response(serializer.data)
+
+    @action(
+        methods=["post"], detail=False, permission_classes=[IsAuthenticated],
+        url_path='me/events_ticket'
+    )
+    def events_ticket(self, request):
+        return Response({
+            'ticket': make_ticket(request.user),
+            'expires_in': EVENTS_TICKET_MAX_AGE,
+        })
+
     @action(methods=["post"], detail=False,
             permission_classes=[IsAuthenticated])
     def set_password(self, request, *args, **kwargs):
@@ -59,7 +123,7 @@ class UserViewSet(viewsets.ModelViewSet):
         )
         serializer.is_valid(raise_exception=True)
         user.set_password(serializer.validated_data["new_password"])
-        user.save()
+        user.save(update_fields=['password'])
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(
@@ -82,21 +146,17 @@ class UserViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        if avatar_data.startswith('data:image'):
-            format, imgstr = avatar_data.split(';base64,')
-            ext = format.split('/')[-1]
-            avatar = ContentFile(base64.b64decode(imgstr),
-                                 name=f"{uuid.uuid4()}.{ext}")
-            user.avatar = avatar
-            user.save()
+        try:
+            user.avatar = decode_base64_image(avatar_data)
+        except ValidationError as error:
             return Response(
-                {"avatar": request.build_absolute_uri(user.avatar.url)},
-                status=status.HTTP_200_OK
+                {"detail": error.detail[0]},
+                status=status.HTTP_400_BAD_REQUEST
             )
-
+        user.save()
         return Response(
-            {"detail": "Неверный формат изображения."},
-            status=status.HTTP_400_BAD_REQUEST
+            {"avatar": request.build_absolute_uri(user.avatar.url)},
+            status=status.HTTP_200_OK
         )
 
 
@@ -108,7 +168,7 @@ class FollowView(ListAPIView):
 
     def get_queryset(self):
         user = self.request.user
-        return user.follower.all()
+        return user.follower.filter(author__deleted_at__isnull=True)
 
 
 class FollowToView(views.APIView):
@@ -117,7 +177,7 @@ class FollowToView(views.APIView):
     permission_classes = (IsAuthenticated, )
 
     def post(self, request, pk):
-        author = get_object_or_404(User, pk=pk)
+        author = get_object_or_404(User, pk=pk, deleted_at__isnull=True)
         user = self.request.user
         data = {'author': author.id, 'user': user.id}
         serializer = FollowToSerializer(
@@ -140,11 +200,46 @@ class FollowToView(views.APIView):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class FeedView(ListAPIView):
+    """Лента рецептов авторов из подписок пользователя"""
+    pagination_class = FeedPagination
+    permission_classes = (IsAuthenticated,)
+
+    def list(self, request, *args, **kwargs):
+        serializer = FastRecipeListSerializer(
+            self.get_serializer_context(),
+            get_requested_fields(request, RecipeReadSerializer.Meta.fields)
+        )
+        page = self.paginator.paginate_timeline(
+            FeedTimeline(request.user), request
+        )
+        rows = {
+            row['id']: row for row in
+            serializer.get_queryset(Recipe.objects.filter(pk__in=page))
+        }
+        return self.get_paginated_response(serializer.to_representation(
+            [rows[pk] for pk in page if pk in rows]
+        ))
+
+
+class TagViewSet(AnonymousCacheMixin, viewsets.ReadOnlyModelViewSet):
     """Теги."""
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = (AdminOrReadOnly,)
+    cache_namespaces = (TAGS_NAMESPACE,)
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(
+            request,
+            lambda: super(TagViewSet, self).list(request, *args, **kwargs)
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            request,
+            lambda: super(TagViewSet, self).retrieve(request, *args, **kwargs)
+        )
 
 
 class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
@@ -159,7 +254,7 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     search_fields = ('^name', )
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(AnonymousCacheMixin, viewsets.ModelViewSet):
     """Рецепты, фильтрация по параметрам, пагинация."""
 
     queryset = Recipe.objects.all()
@@ -167,16 +262,76 @@ class RecipeViewSet(viewsets.ModelViewSet):
     pagination_class = CustomPagination
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
+    cache_namespaces = (RECIPES_NAMESPACE,)
 
     def get_serializer_class(self):
         if self.request.method in ['POST', 'PUT', 'PATCH']:
             return RecipeWriteSerializer
         return RecipeReadSerializer
 
+    def get_queryset(self):
+        queryset = Recipe.objects.all()
+        if self.action not in ('list', 'retrieve'):
+            return queryset
+        user = self.request.user
+        fields = get_requested_fields(
+            self.request, RecipeReadSerializer.Meta.fields
+        )
+        if 'author' in fields:
+            queryset = queryset.select_related('author')
+        if 'ingredients' in fields:
+            queryset = queryset.prefetch_related(Prefetch(
+                'ingredient_in_recipe',
+                queryset=IngredientAmount.objects.select_related('ingredient')
+            ))
+        return annotate_recipe_flags(queryset, user, fields)
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(Recipe.objects.all())
+        validators = get_list_validators(request)
+        not_modified = conditional_response(request, validators)
+        if not_modified is not None:
+            return not_modified
+        response = self.cached_response(
+            request, lambda: self.get_list_response(request, queryset)
+        )
+        return set_validators(request, response, validators)
+
+    def get_list_response(self, request, queryset):
+        serializer = FastRecipeListSerializer(
+            self.get_serializer_context(),
+            get_requested_fields(request, RecipeReadSerializer.Meta.fields)
+        )
+        queryset = serializer.get_queryset(queryset)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(
+                serializer.to_representation(page)
+            )
+        return Response(serializer.to_representation(queryset))
+
+    def retrieve(self, request, *args, **kwargs):
+        state = get_recipe_state(request, kwargs['pk'])
+        if state is None:
+            return super().retrieve(request, *args, **kwargs)
+        validators = get_detail_validators(request, state)
+        not_modified = conditional_response(request, validators)
+        if not_modified is not None:
+            return not_modified
+        response = self.cached_response(request, lambda: Response(
+            splice_user_flags(
+                get_snapshot(state['pk'], state['version']), request, state
+            )
+        ))
+        return set_validators(request, response, validators)
+
     def perform_create(self, serializer):
         user = self.request.user
         serializer.save(author=user)
 
+    def perform_destroy(self, instance):
+        hide_recipe(instance)
+
     @action(
         detail=True,
         methods=['post', 'delete'],
@@ -276,6 +431,46 @@ class RecipeViewSet(viewsets.ModelViewSet):
         response['Content-Disposition'] = f'attachment; filename="{filename}"'
         return response
 
+    @action(detail=False, methods=['get'])
+    def changes(self, request):
+        try:
+            since = decode_cursor(request.query_params.get('since'))
+        except ValueError as error:
+            raise ValidationError({'since': str(error)})
+        return Response(get_changes(since))
+
+    @action(detail=False, methods=['get'])
+    def facets(self, request):
+        return self.cached_response(request, lambda: Response(
+            get_tag_facets(request, Recipe.objects.all())
+        ))
+
+    @action(detail=False, methods=['get'],
+            permission_classes=[IsAdminUser])
+    def export(self, request):
+        try:
+            updated_since = parse_updated_since(
+                request.query_params.get('updated_since')
+            )
+        except ValueError as error:
+            raise ValidationError({'updated_since': str(error)})
+        response = StreamingHttpResponse(
+            iter_recipes_ndjson(updated_since),
+            content_type='application/x-ndjson; charset=utf-8'
+        )
+        response['Content-Disposition'] = (
+            'attachment; filename="recipes.ndjson"'
+        )
+        return response
+
+    @action(detail=False, methods=['post'], url_path='import',
+            permission_classes=[IsAdminUser])
+    def import_recipes(self, request):
+        if not isinstance(request.data, list):
+            raise ValidationError('Ожидается список рецептов.')
+        result = RecipeImporter(author=request.user).run(request.data)
+        return Response(result, status=status.HTTP_200_OK)
+
     @action(
         detail=True,
         methods=("get",),
@@ -285,11 +480,19 @@ class RecipeViewSet(viewsets.ModelViewSet):
     def get_link(self, request, pk):
         get_object_or_404(Recipe, pk=pk)
         link = reverse(
-            viewname='api:recipes-get-link',
-            kwargs={'pk': pk},
+            viewname='short-link',
+            kwargs={'code': get_short_code(pk)},
             request=request
         )
 
         return Response({
             "short-link": request.build_absolute_uri(link)
         })
+
+
+def short_link_redirect(request, code):
+    """Переход по короткой ссылке на страницу рецепта."""
+    recipe_id = resolve_short_code(code)
+    if recipe_id is None:
+        raise Http404('Короткая ссылка не найдена.')
+    return redirect(f'/recipes/{recipe_id}/')
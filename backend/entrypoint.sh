@@ -6,6 +6,18 @@ while ! nc -z "$DB_HOST" "$DB_PORT"; do
   sleep 1
 done
 
+python manage.py check --deploy
+
+if [ "$1" = "worker" ]; then
+  exec python manage.py run_workers --concurrency "${WORKER_CONCURRENCY:-2}"
+fi
+
+# События SSE и async-эндпоинты /api/async/ отдаёт отдельный
+# ASGI-сервис, остальное API работает под WSGI.
+if [ "$1" = "asgi" ]; then
+  exec gunicorn foodgram.asgi:application --worker-class uvicorn.workers.UvicornWorker --bind 0.0.0.0:8001
+fi
+
 python manage.py migrate
 
 INGREDIENT_COUNT=$(python manage.py shell -c "import django; django.setup(); from recipes.models import Ingredient; print(Ingredient.objects.count())" 2>/dev/null | tail -n 1 | tr -d '\r')
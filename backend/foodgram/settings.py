@@ -1,7 +1,7 @@
 import os
 from pathlib import Path
 
-from decouple import config
+from decouple import Csv, config
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -34,6 +34,7 @@ INSTALLED_APPS = [
     'recipes',
     'users.apps.UsersConfig',
     'api',
+    'jobs',
     'rest_framework.authtoken',
     'djoser',
 ]
@@ -44,8 +45,10 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'api.db_router.ReplicaMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api.profiling.ProfilerMiddleware',
 ]
 
 REST_FRAMEWORK = {
@@ -56,6 +59,17 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.TokenAuthentication',
     ],
+
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+
+    'DEFAULT_PARSER_CLASSES': [
+        'api.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
 ROOT_URLCONF = 'foodgram.urls'
@@ -78,6 +92,8 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'foodgram.wsgi.application'
 
+ASGI_APPLICATION = 'foodgram.asgi.application'
+
 
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
@@ -93,6 +109,53 @@ DATABASES = {
     }
 }
 
+# Реплики для чтения, хосты через запятую. В тестах реплики
+# указывают на основную базу.
+REPLICA_DATABASES = []
+for number, host in enumerate(
+    filter(None, os.getenv('DB_REPLICA_HOSTS', '').split(',')), start=1
+):
+    alias = f'replica{number}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'HOST': host.strip(),
+        'TEST': {'MIRROR': 'default'},
+    }
+    REPLICA_DATABASES.append(alias)
+
+DATABASE_ROUTERS = ['api.db_router.ReplicaRouter']
+
+# Поколения кэша ответов API, закрепления за основной базой и короткие
+# ссылки должны быть общими для веб-процессов и воркера очереди.
+# LocMemCache у каждого процесса свой, поэтому без DEBUG проверка
+# api.E001 требует общий бэкенд, например Redis.
+CACHES = {
+    'default': {
+        'BACKEND': config(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': config('CACHE_LOCATION', default=''),
+    }
+}
+
+API_CACHE_TIMEOUT = 300
+
+# События SSE отдаёт отдельный ASGI-сервис, а публикуют их веб-процессы
+# и воркер, поэтому без DEBUG проверка api.E002 требует
+# api.events.RedisBackend.
+EVENTS_BACKEND = config(
+    'EVENTS_BACKEND', default='api.events.InProcessBackend'
+)
+EVENTS_REDIS_URL = config('EVENTS_REDIS_URL', default='')
+
+# Выборочное профилирование запросов, см. api.profiling.
+PROFILER_ENABLED = config('PROFILER_ENABLED', default=False, cast=bool)
+PROFILER_URL_NAMES = config('PROFILER_URL_NAMES', default='', cast=Csv())
+PROFILER_SAMPLE_RATE = config('PROFILER_SAMPLE_RATE', default=0.0, cast=float)
+PROFILER_SLOW_MS = config('PROFILER_SLOW_MS', default=0, cast=int)
+PROFILER_DIR = config('PROFILER_DIR', default='/backend_profiles/')
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -0,0 +1,14 @@
+import tempfile
+from pathlib import Path
+
+from foodgram.settings import *  # noqa: F401,F403
+from foodgram.settings import DATABASES
+
+# Отстающая реплика для тестов маршрутизатора: отдельный файл SQLite,
+# в который изменения основной базы не попадают.
+STALE_REPLICA_NAME = str(Path(tempfile.mkdtemp()) / 'replica.sqlite3')
+DATABASES['stale_replica'] = {
+    'ENGINE': 'django.db.backends.sqlite3',
+    'NAME': STALE_REPLICA_NAME,
+    'TEST': {'NAME': STALE_REPLICA_NAME},
+}
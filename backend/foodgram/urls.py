@@ -3,9 +3,28 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
+from api.profiling import profile_detail, profile_download, profile_list
+from api.views import short_link_redirect
+
 urlpatterns = [
+    path(
+        'admin/profiles/',
+        admin.site.admin_view(profile_list),
+        name='admin-profiles',
+    ),
+    path(
+        'admin/profiles/<str:capture_id>/',
+        admin.site.admin_view(profile_detail),
+        name='admin-profile',
+    ),
+    path(
+        'admin/profiles/<str:capture_id>/<str:kind>/',
+        admin.site.admin_view(profile_download),
+        name='admin-profile-download',
+    ),
     path('admin/', admin.site.urls),
     path('api/', include('api.urls', namespace='api')),
+    path('s/<str:code>/', short_link_redirect, name='short-link'),
 ]
 
 if settings.DEBUG:
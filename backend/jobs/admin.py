@@ -0,0 +1,16 @@
+from django.contrib.admin import ModelAdmin, register
+
+from jobs.models import Job
+
+
+@register(Job)
+class JobAdmin(ModelAdmin):
+    list_display = (
+        "pk", "name", "status", "attempts", "run_at", "started_at",
+        "finished_at", "locked_by", "progress",
+    )
+    list_filter = ("status", "name")
+    search_fields = ("name",)
+    readonly_fields = (
+        "created_at", "started_at", "heartbeat_at", "finished_at"
+    )
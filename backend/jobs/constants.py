@@ -0,0 +1,8 @@
+JOB_MAX_ATTEMPTS = 5
+JOB_RETRY_DELAY = 10
+JOB_MAX_RETRY_DELAY = 3600
+JOB_TIMEOUT = 600
+JOB_POLL_INTERVAL = 1
+JOB_CLAIM_BATCH = 10
+JOB_RETENTION_DAYS = 7
+JOB_PURGE_INTERVAL = 3600
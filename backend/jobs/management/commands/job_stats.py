@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from jobs.queue import get_job_metrics
+
+
+class Command(BaseCommand):
+    help = 'Состояние очереди фоновых задач.'
+
+    def handle(self, *args, **options):
+        metrics = get_job_metrics()
+        statuses = ', '.join(
+            f'{status}: {count}'
+            for status, count in sorted(metrics['statuses'].items())
+        )
+        self.stdout.write(f'Задачи: {statuses or "нет"}')
+        self.stdout.write(f'Отставание очереди: {metrics["lag"]:.1f} с')
+        for job in metrics['running']:
+            self.stdout.write(
+                f'Выполняется {job["name"]}{tuple(job["args"])}: '
+                f'{job["progress"]}'
+            )
+        for row in metrics['functions']:
+            average = row['avg_duration']
+            maximum = row['max_duration']
+            self.stdout.write(
+                f'{row["name"]}: выполнено {row["done"]}, '
+                f'ошибок {row["failed"]}, в очереди {row["pending"]}, '
+                f'с повторами {row["retried"]}, '
+                f'среднее {average.total_seconds() if average else 0:.3f} с, '
+                f'максимум {maximum.total_seconds() if maximum else 0:.3f} с'
+            )
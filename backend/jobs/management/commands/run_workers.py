@@ -0,0 +1,81 @@
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from jobs.constants import JOB_POLL_INTERVAL
+from jobs.queue import work
+
+
+class Command(BaseCommand):
+    help = 'Запуск обработчиков фоновых задач.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', type=int, default=2,
+            help='Количество обработчиков.'
+        )
+        parser.add_argument(
+            '--pool', choices=('thread', 'process'), default='thread',
+            help='Обработчики в потоках или в отдельных процессах.'
+        )
+        parser.add_argument(
+            '--poll-interval', type=float, default=JOB_POLL_INTERVAL,
+            help='Пауза между опросами пустой очереди, секунды.'
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выполнить готовые задачи и завершиться.'
+        )
+
+    def handle(self, *args, **options):
+        prefix = f'{socket.gethostname()}:{os.getpid()}'
+        work_args = [
+            (f'{prefix}:{number}', options['poll_interval'], options['once'])
+            for number in range(options['concurrency'])
+        ]
+        if options['pool'] == 'process':
+            self.run_processes(work_args)
+        else:
+            self.run_threads(work_args)
+
+    def run_threads(self, work_args):
+        stop = threading.Event()
+        threads = [
+            threading.Thread(target=work, args=(worker, stop, *rest))
+            for worker, *rest in work_args
+        ]
+        for thread in threads:
+            thread.start()
+        signal.signal(signal.SIGTERM, lambda *args: stop.set())
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(timeout=1)
+        except KeyboardInterrupt:
+            stop.set()
+            for thread in threads:
+                thread.join()
+
+    def run_processes(self, work_args):
+        # Соединения с базой не должны наследоваться дочерними процессами.
+        connections.close_all()
+        stop = multiprocessing.Event()
+        processes = [
+            multiprocessing.Process(target=work, args=(worker, stop, *rest))
+            for worker, *rest in work_args
+        ]
+        for process in processes:
+            process.start()
+        signal.signal(signal.SIGTERM, lambda *args: stop.set())
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            stop.set()
+            for process in processes:
+                process.join()
@@ -0,0 +1,91 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Job(models.Model):
+    """Фоновая задача"""
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Выполнена'),
+        (FAILED, 'Ошибка'),
+    )
+
+    name = models.CharField(
+        verbose_name='Функция',
+        max_length=255,
+        db_index=True
+    )
+    args = models.JSONField(
+        verbose_name='Аргументы',
+        default=list
+    )
+    status = models.CharField(
+        verbose_name='Статус',
+        max_length=16,
+        choices=STATUSES,
+        default=PENDING
+    )
+    attempts = models.PositiveSmallIntegerField(
+        verbose_name='Попытки',
+        default=0
+    )
+    max_attempts = models.PositiveSmallIntegerField(
+        verbose_name='Максимум попыток'
+    )
+    run_at = models.DateTimeField(
+        verbose_name='Запустить после',
+        default=timezone.now
+    )
+    created_at = models.DateTimeField(
+        verbose_name='Создана',
+        auto_now_add=True
+    )
+    started_at = models.DateTimeField(
+        verbose_name='Начата',
+        null=True,
+        blank=True
+    )
+    finished_at = models.DateTimeField(
+        verbose_name='Завершена',
+        null=True,
+        blank=True
+    )
+    heartbeat_at = models.DateTimeField(
+        verbose_name='Последний признак жизни',
+        null=True,
+        blank=True
+    )
+    locked_by = models.CharField(
+        verbose_name='Обработчик',
+        max_length=64,
+        blank=True
+    )
+    progress = models.JSONField(
+        verbose_name='Прогресс',
+        default=dict,
+        blank=True
+    )
+    last_error = models.TextField(
+        verbose_name='Последняя ошибка',
+        blank=True
+    )
+
+    class Meta:
+        verbose_name = 'Задача'
+        verbose_name_plural = 'Задачи'
+        ordering = ('-created_at',)
+        indexes = (
+            models.Index(
+                fields=('status', 'run_at'),
+                name='job_status_run_at_idx',
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.name}{tuple(self.args)} ({self.status})'
@@ -0,0 +1,249 @@
+import logging
+import threading
+import time
+import traceback
+from datetime import timedelta
+
+from django.db import DatabaseError, close_old_connections, transaction
+from django.db.models import Avg, Count, F, Max, Min, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .constants import (JOB_CLAIM_BATCH, JOB_MAX_ATTEMPTS,
+                        JOB_MAX_RETRY_DELAY, JOB_PURGE_INTERVAL,
+                        JOB_RETENTION_DAYS, JOB_RETRY_DELAY, JOB_TIMEOUT)
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+_current = threading.local()
+
+
+def get_job_name(func):
+    return f'{func.__module__}.{func.__qualname__}'
+
+
+def enqueue(func, *args, max_attempts=JOB_MAX_ATTEMPTS, delay=0,
+            unique=False):
+    """
+    Постановка вызова func(*args) в очередь.
+    Строка задачи пишется после фиксации текущей транзакции: она не
+    удлиняет транзакцию запроса, а при откате задача не ставится вовсе.
+    Вне транзакции строка пишется сразу. С unique=True вызов не ставится,
+    если такой же ещё ждёт в очереди; вместе с delay это схлопывает
+    серию одинаковых пересчётов в один. Аргументы хранятся в JSON,
+    поэтому передаются id, а не объекты моделей.
+    """
+    name = get_job_name(func)
+    args = list(args)
+
+    def create():
+        if unique and Job.objects.filter(
+            name=name, args=args, status=Job.PENDING
+        ).exists():
+            return
+        Job.objects.create(
+            name=name,
+            args=args,
+            max_attempts=max_attempts,
+            run_at=timezone.now() + timedelta(seconds=delay),
+        )
+
+    transaction.on_commit(create)
+
+
+def get_retry_delay(attempts):
+    """Экспоненциальная задержка перед повтором."""
+    return min(JOB_RETRY_DELAY * 2 ** (attempts - 1), JOB_MAX_RETRY_DELAY)
+
+
+def claim_jobs(worker, limit=JOB_CLAIM_BATCH):
+    """
+    Захват задач, готовых к запуску, и задач, от которых JOB_TIMEOUT
+    секунд не было признаков жизни, если у них остались попытки.
+    SELECT ... FOR UPDATE SKIP LOCKED не даёт обработчикам ждать друг
+    друга, а условный UPDATE по статусу защищает от двойного захвата
+    на базах без блокировок строк, например SQLite.
+    """
+    now = timezone.now()
+    stale = Q(
+        status=Job.RUNNING,
+        heartbeat_at__lt=now - timedelta(seconds=JOB_TIMEOUT),
+    )
+    # Задача, которая исчерпала попытки и снова зависла, больше не
+    # запускается: иначе она бы вечно роняла обработчики.
+    Job.objects.filter(stale, attempts__gte=F('max_attempts')).update(
+        status=Job.FAILED,
+        finished_at=now,
+        last_error='Превышено время выполнения.',
+    )
+    ready = Q(status=Job.PENDING, run_at__lte=now) | (
+        stale & Q(attempts__lt=F('max_attempts'))
+    )
+    claimed = []
+    with transaction.atomic():
+        candidates = list(
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(ready)
+            .order_by('run_at')
+            .values_list('pk', 'status')[:limit]
+        )
+        for pk, status in candidates:
+            if Job.objects.filter(pk=pk, status=status).filter(ready).update(
+                status=Job.RUNNING,
+                heartbeat_at=now,
+                locked_by=worker,
+                attempts=F('attempts') + 1,
+            ):
+                claimed.append(pk)
+    return list(Job.objects.filter(pk__in=claimed).order_by('run_at'))
+
+
+def _owned(job):
+    """
+    Строка задачи, пока она принадлежит этому захвату. Если задачу
+    перехватил другой обработчик, обновления ничего не меняют.
+    """
+    return Job.objects.filter(
+        pk=job.pk, status=Job.RUNNING,
+        locked_by=job.locked_by, attempts=job.attempts,
+    )
+
+
+def report_progress(**progress):
+    """
+    Прогресс выполняемой задачи, виден в админке и job_stats.
+    Заодно продлевает захват: долгая задача, которая сообщает о
+    прогрессе, не считается зависшей. Вне обработчика вызов ничего
+    не делает.
+    """
+    job = getattr(_current, 'job', None)
+    if job is not None:
+        _owned(job).update(progress=progress, heartbeat_at=timezone.now())
+
+
+def run_job(job):
+    """
+    Выполнение задачи с повтором при ошибке. Отсчёт JOB_TIMEOUT
+    начинается с запуска, а не с захвата пачки; задача, которую за
+    время ожидания перехватил другой обработчик, пропускается.
+    """
+    now = timezone.now()
+    if not _owned(job).update(started_at=now, heartbeat_at=now):
+        logger.warning('Задача %s перехвачена другим обработчиком', job)
+        return False
+    started = time.monotonic()
+    _current.job = job
+    try:
+        import_string(job.name)(*job.args)
+    except Exception:
+        error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            delay = get_retry_delay(job.attempts)
+            _owned(job).update(
+                status=Job.PENDING,
+                run_at=timezone.now() + timedelta(seconds=delay),
+                last_error=error,
+            )
+            logger.warning(
+                'Задача %s упала (попытка %s), повтор через %s с',
+                job, job.attempts, delay,
+            )
+        else:
+            _owned(job).update(
+                status=Job.FAILED, finished_at=timezone.now(),
+                last_error=error,
+            )
+            logger.error('Задача %s упала окончательно\n%s', job, error)
+        return False
+    finally:
+        _current.job = None
+    _owned(job).update(status=Job.DONE, finished_at=timezone.now())
+    logger.info(
+        'Задача %s выполнена за %.3f с', job, time.monotonic() - started
+    )
+    return True
+
+
+def work(worker, stop, poll_interval, once=False):
+    """
+    Цикл обработчика: захват пачки задач и их выполнение.
+    С once=True завершается, когда готовых задач не осталось. Раз в
+    JOB_PURGE_INTERVAL секунд удаляет старые завершённые задачи.
+    """
+    purged_at = None
+    while not stop.is_set():
+        close_old_connections()
+        if not once and (
+            purged_at is None
+            or time.monotonic() - purged_at >= JOB_PURGE_INTERVAL
+        ):
+            purged_at = time.monotonic()
+            try:
+                purged = purge_jobs()
+            except DatabaseError as error:
+                logger.warning('Старые задачи не удалены: %s', error)
+            else:
+                if purged:
+                    logger.info('Удалено старых задач: %s', purged)
+        try:
+            jobs = claim_jobs(worker)
+        except DatabaseError as error:
+            logger.warning(
+                'Обработчик %s не смог захватить задачи: %s', worker, error
+            )
+            stop.wait(poll_interval)
+            continue
+        for job in jobs:
+            run_job(job)
+        if not jobs:
+            if once:
+                break
+            stop.wait(poll_interval)
+    close_old_connections()
+
+
+def purge_jobs(days=JOB_RETENTION_DAYS):
+    """Удаление выполненных и упавших задач старше days дней."""
+    deleted, _ = Job.objects.filter(
+        status__in=(Job.DONE, Job.FAILED),
+        finished_at__lt=timezone.now() - timedelta(days=days),
+    ).delete()
+    return deleted
+
+
+def get_job_metrics():
+    """Число задач по статусам и длительность выполнения по функциям."""
+    now = timezone.now()
+    by_status = dict(
+        Job.objects.order_by().values_list('status')
+        .annotate(count=Count('pk'))
+    )
+    oldest = Job.objects.filter(
+        status=Job.PENDING, run_at__lte=now
+    ).aggregate(run_at=Min('run_at'))['run_at']
+    by_name = (
+        Job.objects.order_by('name').values('name').annotate(
+            done=Count('pk', filter=Q(status=Job.DONE)),
+            failed=Count('pk', filter=Q(status=Job.FAILED)),
+            pending=Count('pk', filter=Q(status=Job.PENDING)),
+            retried=Count('pk', filter=Q(attempts__gt=1)),
+            avg_duration=Avg(
+                F('finished_at') - F('started_at'),
+                filter=Q(status=Job.DONE),
+            ),
+            max_duration=Max(
+                F('finished_at') - F('started_at'),
+                filter=Q(status=Job.DONE),
+            ),
+        )
+    )
+    running = Job.objects.filter(status=Job.RUNNING).order_by(
+        'started_at'
+    ).values('name', 'args', 'progress')
+    return {
+        'statuses': by_status,
+        'running': list(running),
+        'lag': (now - oldest).total_seconds() if oldest else 0,
+        'functions': list(by_name),
+    }
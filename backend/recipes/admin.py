@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.contrib.admin import ModelAdmin, register
 
-
+from api.deletion import HideOnDeleteMixin, hide_recipe
 from recipes.models import (Favorite, Ingredient, IngredientAmount, Recipe,
                             Cart, Tag)
 from users.models import Follow
@@ -20,7 +20,8 @@ class IngredientAmountInline(admin.TabularInline):
 
 
 @register(Recipe)
-class RecipeAdmin(ModelAdmin):
+class RecipeAdmin(HideOnDeleteMixin, ModelAdmin):
+    hide = staticmethod(hide_recipe)
     list_display = ("pk", "name", "author", "get_favorites", "pub_date")
     list_filter = ("author", "name")
     search_fields = ("name", "author__username")
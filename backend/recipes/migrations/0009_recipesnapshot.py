@@ -0,0 +1,24 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_recipe_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeSnapshot',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='snapshot', serialize=False, to='recipes.recipe', verbose_name='Рецепт')),
+                ('data', models.JSONField(verbose_name='Данные')),
+                ('version', models.PositiveIntegerField(verbose_name='Версия рецепта')),
+            ],
+            options={
+                'verbose_name': 'Снимок рецепта',
+                'verbose_name_plural': 'Снимки рецептов',
+            },
+        ),
+    ]
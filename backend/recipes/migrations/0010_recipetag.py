@@ -0,0 +1,43 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """
+    Явная промежуточная модель для уже существующей таблицы
+    recipes_recipe_tags и индекс (tag, recipe) для подсчёта фасетов.
+    """
+
+    dependencies = [
+        ('recipes', '0009_recipesnapshot'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='RecipeTag',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tag_links', to='recipes.recipe')),
+                        ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recipe_links', to='recipes.tag')),
+                    ],
+                    options={
+                        'verbose_name': 'Тег рецепта',
+                        'verbose_name_plural': 'Теги рецептов',
+                        'db_table': 'recipes_recipe_tags',
+                        'unique_together': {('recipe', 'tag')},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name='recipe',
+                    name='tags',
+                    field=models.ManyToManyField(through='recipes.RecipeTag', to='recipes.tag', verbose_name='Тег'),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='recipetag',
+            index=models.Index(fields=['tag', 'recipe'], name='recipe_tag_tag_recipe_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0016_feedentry_pub_date'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='recipe',
+            name='unique_for_author',
+        ),
+        migrations.AddConstraint(
+            model_name='recipe',
+            constraint=models.UniqueConstraint(condition=models.Q(('deleted_at__isnull', True)), fields=('name', 'author'), name='unique_for_author'),
+        ),
+    ]
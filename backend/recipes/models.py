@@ -56,6 +56,13 @@ class Ingredient(models.Model):
         return f'{self.name}'
 
 
+class RecipeManager(models.Manager):
+    """Рецепты без скрытых до фонового удаления."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
 class Recipe(models.Model):
     """Рецепт"""
 
@@ -75,6 +82,12 @@ class Recipe(models.Model):
         null=False,
         blank=False
     )
+    image_variants = models.JSONField(
+        verbose_name='Уменьшенные копии картинки',
+        default=dict,
+        blank=True,
+        editable=False
+    )
     text = models.TextField(
         verbose_name='Описание',
         max_length=3000
@@ -85,6 +98,7 @@ class Recipe(models.Model):
     )
     tags = models.ManyToManyField(
         Tag,
+        through='RecipeTag',
         verbose_name='Тег',
     )
     cooking_time = models.PositiveSmallIntegerField(
@@ -98,21 +112,97 @@ class Recipe(models.Model):
         verbose_name='Дата публикации',
         auto_now_add=True
     )
+    updated_at = models.DateTimeField(
+        verbose_name='Дата изменения',
+        auto_now=True,
+        db_index=True
+    )
+    version = models.PositiveIntegerField(
+        verbose_name='Версия',
+        default=1,
+        editable=False
+    )
+    deleted_at = models.DateTimeField(
+        verbose_name='Дата удаления',
+        null=True,
+        blank=True,
+        editable=False
+    )
+
+    objects = RecipeManager()
+    all_objects = models.Manager()
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ('-pub_date', )
         constraints = (
+            # Скрытый до фонового удаления рецепт не занимает название.
             models.UniqueConstraint(
                 fields=('name', 'author'),
+                condition=models.Q(deleted_at__isnull=True),
                 name='unique_for_author',
             ),
         )
+        indexes = (
+            models.Index(
+                fields=('-pub_date',),
+                name='recipe_pub_date_idx',
+            ),
+            models.Index(
+                fields=('author', '-pub_date'),
+                name='recipe_author_pub_date_idx',
+            ),
+        )
 
     def __str__(self):
         return f'{self.name}. Автор: {self.author.username}'
 
+    def save(self, *args, **kwargs):
+        # Версия растёт в том же UPDATE, что и сохраняет рецепт:
+        # выражение не теряет одновременные изменения.
+        adding = self._state.adding
+        if not adding:
+            self.version = models.F('version') + 1
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None:
+                kwargs['update_fields'] = {
+                    *update_fields, 'version', 'updated_at'
+                }
+        super().save(*args, **kwargs)
+        if not adding:
+            self.refresh_from_db(fields=('version',))
+
+
+class RecipeTag(models.Model):
+    """Many-to-many рецепт-теги"""
+
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='tag_links',
+    )
+    tag = models.ForeignKey(
+        Tag,
+        on_delete=models.CASCADE,
+        related_name='recipe_links',
+    )
+
+    class Meta:
+        db_table = 'recipes_recipe_tags'
+        verbose_name = 'Тег рецепта'
+        verbose_name_plural = 'Теги рецептов'
+        unique_together = ('recipe', 'tag')
+        indexes = (
+            models.Index(
+                fields=('tag', 'recipe'),
+                name='recipe_tag_tag_recipe_idx',
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.recipe_id} -> {self.tag_id}'
+
 
 class IngredientAmount(models.Model):
     """Many-to-many рецепт-ингридиенты с количеством"""
@@ -200,3 +290,121 @@ class Cart(models.Model):
 
     def __str__(self):
         return f'{self.user} -> {self.recipe}'
+
+
+class RecipeSnapshot(models.Model):
+    """Готовое представление рецепта без пользовательских флагов"""
+
+    recipe = models.OneToOneField(
+        Recipe,
+        verbose_name='Рецепт',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='snapshot',
+    )
+    data = models.JSONField(
+        verbose_name='Данные',
+    )
+    version = models.PositiveIntegerField(
+        verbose_name='Версия рецепта',
+    )
+
+    class Meta:
+        verbose_name = 'Снимок рецепта'
+        verbose_name_plural = 'Снимки рецептов'
+
+    def __str__(self):
+        return f'{self.recipe_id} (версия {self.version})'
+
+
+class FeedEntry(models.Model):
+    """Рецепт в ленте подписчика"""
+
+    user = models.ForeignKey(
+        User,
+        verbose_name='Пользователь',
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        verbose_name='Рецепт',
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+    )
+    author = models.ForeignKey(
+        User,
+        verbose_name='Автор',
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    pub_date = models.DateTimeField(
+        verbose_name='Дата публикации рецепта',
+    )
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'recipe'),
+                name='unique_feed_entry',
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('user', 'author'),
+                name='feed_entry_user_author_idx',
+            ),
+            models.Index(
+                fields=('user', '-pub_date'),
+                name='feed_entry_user_pub_date_idx',
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.user_id} <- {self.recipe_id}'
+
+
+class ShortLink(models.Model):
+    """Короткая ссылка на рецепт"""
+
+    recipe = models.OneToOneField(
+        Recipe,
+        verbose_name='Рецепт',
+        on_delete=models.CASCADE,
+        related_name='short_link',
+    )
+    code = models.CharField(
+        verbose_name='Код',
+        max_length=16,
+        unique=True
+    )
+
+    class Meta:
+        verbose_name = 'Короткая ссылка'
+        verbose_name_plural = 'Короткие ссылки'
+
+    def __str__(self):
+        return f'{self.code} -> {self.recipe_id}'
+
+
+class DeletedRecipe(models.Model):
+    """Журнал удалённых рецептов для синхронизации клиентов"""
+
+    recipe_id = models.PositiveBigIntegerField(
+        verbose_name='ID рецепта',
+    )
+    deleted_at = models.DateTimeField(
+        verbose_name='Дата удаления',
+        auto_now_add=True,
+        db_index=True
+    )
+
+    class Meta:
+        verbose_name = 'Удалённый рецепт'
+        verbose_name_plural = 'Удалённые рецепты'
+        ordering = ('deleted_at',)
+
+    def __str__(self):
+        return f'{self.recipe_id} ({self.deleted_at})'
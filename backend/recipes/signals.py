@@ -0,0 +1,169 @@
+from api.cache import (RECIPES_NAMESPACE, TAGS_NAMESPACE,
+                       bump_namespace_on_commit)
+from api.constants import SUGGESTIONS_REFRESH_DELAY
+from api.feed import backfill_feed, prune_feed
+from api.snapshots import rebuild_author_snapshots
+from api.suggestions import refresh_similar_authors
+from django.contrib.auth import get_user_model
+from django.db.models import F, QuerySet
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete, pre_save)
+from django.dispatch import receiver
+from django.utils import timezone
+from jobs.queue import enqueue
+from users.models import Follow
+
+from .models import DeletedRecipe, Ingredient, IngredientAmount, Recipe, Tag
+
+User = get_user_model()
+
+AUTHOR_PROFILE_FIELDS = frozenset(
+    ('email', 'username', 'first_name', 'last_name', 'avatar')
+)
+
+
+def touch_recipes(**lookup):
+    """
+    Обновление updated_at и версии рецептов без вызова save()
+    и инвалидация кэша ответов с рецептами после фиксации.
+    """
+    Recipe.objects.filter(**lookup).update(
+        updated_at=timezone.now(),
+        version=F('version') + 1,
+    )
+    bump_namespace_on_commit(RECIPES_NAMESPACE)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, **kwargs):
+    # Версию и updated_at уже обновил Recipe.save().
+    bump_namespace_on_commit(RECIPES_NAMESPACE)
+
+
+@receiver(post_save, sender=IngredientAmount)
+def ingredient_amount_saved(sender, instance, **kwargs):
+    touch_recipes(pk=instance.recipe_id)
+
+
+@receiver(post_delete, sender=IngredientAmount)
+def ingredient_amount_deleted(sender, instance, origin=None, **kwargs):
+    """
+    При каскадном удалении рецепта или автора рецепт трогать незачем,
+    при удалении ингредиента рецепты уже обновлены в ingredient_deleting.
+    При удалении строк queryset-ом рецепт обновляется один раз,
+    а не на каждую удалённую строку.
+    """
+    if isinstance(origin, QuerySet):
+        if origin.model is not IngredientAmount:
+            return
+        touched = origin.__dict__.setdefault('_touched_recipes', set())
+        if instance.recipe_id in touched:
+            return
+        touched.add(instance.recipe_id)
+    elif isinstance(origin, (Recipe, User, Ingredient)):
+        return
+    touch_recipes(pk=instance.recipe_id)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_changed(sender, instance, action, reverse, pk_set,
+                        **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        touch_recipes(pk=instance.pk)
+    elif pk_set:
+        touch_recipes(pk__in=pk_set)
+
+
+@receiver(pre_save, sender=User)
+def author_profile_saving(sender, instance, update_fields, **kwargs):
+    """
+    Отмечает, меняются ли поля автора, попадающие в рецепты.
+    Сохранение пароля или last_login не трогает рецепты автора.
+    """
+    instance._author_profile_changed = False
+    if instance._state.adding or update_fields is not None and not (
+        AUTHOR_PROFILE_FIELDS & set(update_fields)
+    ):
+        return
+    stored = User.objects.filter(pk=instance.pk).values(
+        *AUTHOR_PROFILE_FIELDS
+    ).first()
+    instance._author_profile_changed = stored is None or any(
+        stored[name] != User._meta.get_field(name).get_prep_value(
+            getattr(instance, name)
+        )
+        for name in AUTHOR_PROFILE_FIELDS
+    )
+
+
+@receiver(post_save, sender=User)
+def author_profile_changed(sender, instance, created, **kwargs):
+    if created or not getattr(instance, '_author_profile_changed', False):
+        return
+    touch_recipes(author=instance)
+    enqueue(rebuild_author_snapshots, instance.pk)
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_saved(sender, instance, created, **kwargs):
+    # Название и единица измерения входят в снимки рецептов,
+    # поэтому рецепты получают новую версию, а не только кэш.
+    if not created:
+        touch_recipes(ingredients=instance)
+
+
+@receiver(pre_delete, sender=Ingredient)
+def ingredient_deleting(sender, instance, **kwargs):
+    touch_recipes(ingredients=instance)
+
+
+@receiver(post_save, sender=Tag)
+def tag_saved(sender, instance, created, **kwargs):
+    bump_namespace_on_commit(TAGS_NAMESPACE)
+    if not created:
+        touch_recipes(tags=instance)
+
+
+@receiver(pre_delete, sender=Tag)
+def tag_deleting(sender, instance, **kwargs):
+    touch_recipes(tags=instance)
+
+
+@receiver(post_delete, sender=Tag)
+def tag_deleted(sender, **kwargs):
+    bump_namespace_on_commit(TAGS_NAMESPACE)
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    # Скрытый рецепт попал в журнал удалений ещё при скрытии.
+    if instance.deleted_at is None:
+        DeletedRecipe.objects.create(recipe_id=instance.pk)
+    bump_namespace_on_commit(RECIPES_NAMESPACE)
+
+
+def refresh_similar_authors_later(author_id):
+    """
+    Пересчёт похожих авторов не чаще раза в SUGGESTIONS_REFRESH_DELAY
+    секунд: подписки на популярного автора приходят сериями, а пересчёт
+    проходит по всем его подписчикам.
+    """
+    enqueue(
+        refresh_similar_authors, author_id,
+        delay=SUGGESTIONS_REFRESH_DELAY, unique=True,
+    )
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        enqueue(backfill_feed, instance.user_id, instance.author_id)
+        refresh_similar_authors_later(instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    enqueue(prune_feed, instance.user_id, instance.author_id)
+    refresh_similar_authors_later(instance.author_id)
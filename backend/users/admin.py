@@ -2,11 +2,14 @@ from django.contrib import admin
 from django.contrib.admin import register
 from django.contrib.auth.admin import UserAdmin
 
+from api.deletion import HideOnDeleteMixin, hide_user
+
 from .models import User
 
 
 @register(User)
-class UserAdminConfig(UserAdmin):
+class UserAdminConfig(HideOnDeleteMixin, UserAdmin):
+    hide = staticmethod(hide_user)
     list_display = (
         "pk",
         "username",
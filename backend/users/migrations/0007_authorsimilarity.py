@@ -0,0 +1,33 @@
+# Generated by Django 4.2.21 on 2026-10-19 07:56
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0006_alter_user_avatar_alter_user_username'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthorSimilarity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(verbose_name='Оценка')),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_authors', to=settings.AUTH_USER_MODEL, verbose_name='Автор')),
+                ('similar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_to', to=settings.AUTH_USER_MODEL, verbose_name='Похожий автор')),
+            ],
+            options={
+                'verbose_name': 'Похожий автор',
+                'verbose_name_plural': 'Похожие авторы',
+                'indexes': [models.Index(fields=['author', '-score'], name='similarity_author_score_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='authorsimilarity',
+            constraint=models.UniqueConstraint(fields=('author', 'similar'), name='unique_author_similarity'),
+        ),
+    ]
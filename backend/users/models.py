@@ -18,6 +18,8 @@ class User(AbstractUser):
     last_name = models.CharField(('last name'), max_length=150, blank=False)
     avatar = models.ImageField(upload_to='avatars/', null=True, blank=True,
                                default='avatars/default.jpg')
+    deleted_at = models.DateTimeField('Дата удаления', null=True, blank=True,
+                                      editable=False)
 
     class Meta:
         verbose_name = 'Пользователь'
@@ -53,3 +55,36 @@ class Follow(models.Model):
 
     def __str__(self):
         return f'{self.user} -> {self.author}'
+
+
+class AuthorSimilarity(models.Model):
+    """Похожий автор по общим подписчикам и общему избранному"""
+
+    author = models.ForeignKey(
+        User,
+        verbose_name='Автор',
+        on_delete=models.CASCADE,
+        related_name='similar_authors',
+    )
+    similar = models.ForeignKey(
+        User,
+        verbose_name='Похожий автор',
+        on_delete=models.CASCADE,
+        related_name='similar_to',
+    )
+    score = models.FloatField('Оценка')
+
+    class Meta:
+        verbose_name = 'Похожий автор'
+        verbose_name_plural = 'Похожие авторы'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['author', 'similar'],
+                name='unique_author_similarity')]
+        indexes = [
+            models.Index(
+                fields=['author', '-score'],
+                name='similarity_author_score_idx')]
+
+    def __str__(self):
+        return f'{self.author} ~ {self.similar}'